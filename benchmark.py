@@ -0,0 +1,197 @@
+import os
+import sys
+import argparse
+import json
+import platform
+import random
+import time
+
+# Headless frame-time benchmarks for cozy_widget and garden_cat. Every scenario
+# runs under SDL's dummy video driver with a seeded RNG and no frame cap, and
+# reports per-phase timings (events, update, draw, present) as percentiles.
+#
+#   python benchmark.py --out bench.json
+#   python benchmark.py --baseline bench.json --threshold 0.15   (exit code 1 on regressions)
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_RENDER_DRIVER", "software")
+
+import pygame
+import numpy as np
+import cozy_widget
+import garden_cat
+
+PHASES = ("events", "update", "draw", "present")
+PERCENTILES = (50, 90, 99)
+MIN_REGRESSION_MS = 0.05 # ignore slowdowns smaller than this, they are noise
+
+class PhaseTimer:
+    # Collects one sample per phase per frame (0 if a phase didn't run)
+    def __init__(self):
+        self.samples = {p: [] for p in PHASES}
+        self.frame = dict.fromkeys(PHASES, 0.0)
+
+    def time(self, phase, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.frame[phase] += time.perf_counter() - start
+        return result
+
+    def end_frame(self, record=True):
+        if record:
+            for p in PHASES:
+                self.samples[p].append(self.frame[p])
+        self.frame = dict.fromkeys(PHASES, 0.0)
+
+    def summary(self):
+        result = {}
+        frame = np.sum([self.samples[p] for p in PHASES], axis=0)
+        for name, values in list(self.samples.items()) + [("frame", frame)]:
+            ms = np.asarray(values) * 1000
+            stats = {f"p{q}": float(np.percentile(ms, q)) for q in PERCENTILES}
+            stats["mean"] = float(ms.mean())
+            stats["max"] = float(ms.max())
+            result[name] = stats
+        return result
+
+def bench_cozy(frames, warmup, seed, fireflies=cozy_widget.FIREFLY_COUNT, walk=False, resize=False,
+               companions=cozy_widget.COMPANIONS, textured=False):
+    size = (cozy_widget.WINDOW_WIDTH, cozy_widget.WINDOW_HEIGHT)
+    screen = pygame.display.set_mode(size, pygame.NOFRAME)
+    if textured:
+        # SDL's software renderer under the dummy driver: compares the code
+        # paths, not what a GPU would do
+        screen = cozy_widget.TextureScreen("benchmark", size)
+    scene = cozy_widget.CozyScene(screen, firefly_count=fireflies, seed=seed, companions=companions)
+    timer = PhaseTimer()
+
+    # Time presenting separately from drawing
+    present = scene.renderer.present
+    scene.renderer.present = lambda rects=None: timer.time("present", present, rects)
+
+    for i in range(warmup + frames):
+        timer.time("events", pygame.event.get)
+        if resize:
+            # Drag the grip back and forth by a pixel per frame
+            step = i % 200
+            w = size[0] + (step if step < 100 else 200 - step)
+            screen = timer.time("events", pygame.display.set_mode, (w, size[1]), pygame.NOFRAME)
+            timer.time("events", scene.resize, screen)
+        if walk and scene.cat.state == "idle":
+            scene.cat.walk_to(0 if scene.cat.x > scene.w / 2 else scene.w - 60)
+
+        timer.time("update", scene.update, 1, 0.0)
+
+        start = time.perf_counter()
+        scene.render()
+        timer.frame["draw"] += time.perf_counter() - start - timer.frame["present"]
+        timer.end_frame(i >= warmup)
+    return timer.summary()
+
+def bench_garden(frames, warmup, seed, trees=garden_cat.TREE_COUNT, cats=garden_cat.CAT_COUNT):
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    screen = pygame.display.set_mode((garden_cat.WIDTH, garden_cat.HEIGHT))
+    herd = garden_cat.CatHerd(cats, rng)
+    renderer = garden_cat.GardenRenderer(garden_cat.create_trees(trees))
+    timer = PhaseTimer()
+
+    for i in range(warmup + frames):
+        timer.time("events", pygame.event.get)
+        if i % 60 == 0:
+            # A click somewhere every second of simulated time
+            pos = (random.randint(0, garden_cat.WIDTH), random.randint(0, garden_cat.HEIGHT))
+            timer.time("events", garden_cat.handle_click, herd, pos)
+            if cats > 1:
+                # and the rest of the crowd wanders off somewhere new
+                herd.set_target(np.arange(cats), rng.uniform(0, garden_cat.WIDTH, cats),
+                                rng.uniform(0, garden_cat.HEIGHT, cats))
+        timer.time("update", herd.update)
+        timer.time("draw", renderer.draw, screen, herd)
+        timer.time("present", pygame.display.flip)
+        timer.end_frame(i >= warmup)
+    return timer.summary()
+
+SCENARIOS = {
+    "cozy_idle": (bench_cozy, {"fireflies": 0}),
+    "cozy_walk": (bench_cozy, {"fireflies": 0, "walk": True}),
+    "cozy_fireflies_15": (bench_cozy, {"fireflies": 15}),
+    "cozy_fireflies_1000": (bench_cozy, {"fireflies": 1000}),
+    "cozy_fireflies_5000": (bench_cozy, {"fireflies": 5000}),
+    "cozy_resize": (bench_cozy, {"resize": True}),
+    "cozy_companions_1000": (bench_cozy, {"fireflies": 0, "companions": 1000}),
+    "cozy_texture_fireflies_1000": (bench_cozy, {"fireflies": 1000, "textured": True}),
+    "garden_default": (bench_garden, {}),
+    "garden_trees_2000": (bench_garden, {"trees": 2000}),
+    "garden_crowd_2000": (bench_garden, {"trees": 2000, "cats": 2000}),
+}
+
+def compare(results, baseline, threshold):
+    # Scenario/phase pairs whose p50 or p90 got slower than the threshold allows
+    regressions = []
+    for name, phases in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        for phase in ("frame",) + PHASES:
+            for stat in ("p50", "p90"):
+                old = base[phase][stat]
+                new = phases[phase][stat]
+                if new > old * (1 + threshold) and new - old > MIN_REGRESSION_MS:
+                    regressions.append(f"{name} {phase} {stat}: {old:.3f} -> {new:.3f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless frame-time benchmarks")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="run only these (repeatable; default: all)")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=30, help="frames run before measuring")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown, 0.15 = 15%%")
+    args = parser.parse_args()
+
+    pygame.init()
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "sdl": ".".join(map(str, pygame.get_sdl_version())),
+            "platform": platform.platform(),
+            "video_driver": os.environ["SDL_VIDEODRIVER"],
+            "frames": args.frames,
+            "seed": args.seed,
+        },
+        "scenarios": {},
+    }
+
+    print(f"{'scenario':28} {'p50':>8} {'p90':>8} {'p99':>8}   " + " ".join(f"{p:>8}" for p in PHASES))
+    for name in args.scenario or SCENARIOS:
+        fn, kwargs = SCENARIOS[name]
+        summary = fn(args.frames, args.warmup, args.seed, **kwargs)
+        results["scenarios"][name] = summary
+        frame = summary["frame"]
+        print(f"{name:28} {frame['p50']:8.3f} {frame['p90']:8.3f} {frame['p99']:8.3f}   "
+              + " ".join(f"{summary[p]['p50']:8.3f}" for p in PHASES))
+    print("(ms per frame; phase columns are p50)")
+    pygame.quit()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions above {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
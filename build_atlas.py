@@ -0,0 +1,132 @@
+import pygame
+import argparse
+import json
+import os
+from clean_image import chroma_key
+from cozy_widget import BLOB_EXT, BLOB_HEADER, BLOB_MAGIC
+
+# Offline asset compiler: turns the raw (magenta-keyed) cat sheet into one
+# tightly packed atlas PNG plus a JSON manifest, so the widget can load it
+# once and slice frames with subsurfaces - no keying or mask work at startup.
+#
+#   python build_atlas.py
+#   python build_atlas.py --sheet assets/cat_sprite_sheet.png --out assets/cat_atlas.png
+#   python build_atlas.py --blobs   (also write raw .bgra blobs for a faster startup)
+
+BLOB_IMAGES = ('background.png', 'firefly.png') # decoded to blobs besides the atlas
+MIN_FRAME_AREA = 0.001 # ignore specks smaller than this fraction of the sheet
+PADDING = 2 # transparent pixels between packed frames
+
+def find_frames(img):
+    # One frame per connected blob; blobs sharing columns (a detached tail or
+    # ear) belong to the same frame. Returned left to right.
+    mask = pygame.mask.from_surface(img)
+    min_area = int(img.get_width() * img.get_height() * MIN_FRAME_AREA)
+    boxes = []
+    for comp in mask.connected_components(minimum=min_area):
+        rects = comp.get_bounding_rects()
+        boxes.append(rects[0].unionall(rects))
+    boxes.sort(key=lambda r: r.x)
+
+    frames = []
+    for box in boxes:
+        if frames and box.left < frames[-1].right:
+            frames[-1] = frames[-1].union(box)
+        else:
+            frames.append(box)
+    return frames
+
+def pack(sizes):
+    # Shelf packing, tallest first. Returns positions and the atlas size.
+    order = sorted(range(len(sizes)), key=lambda i: -sizes[i][1])
+    width = 1
+    while width < max(w for w, _ in sizes) + PADDING:
+        width *= 2
+    # Aim for a roughly square atlas
+    area = sum((w + PADDING) * (h + PADDING) for w, h in sizes)
+    while width * width < area:
+        width *= 2
+
+    positions = [None] * len(sizes)
+    x = y = shelf_h = 0
+    for i in order:
+        w, h = sizes[i]
+        if x + w > width:
+            x = 0
+            y += shelf_h + PADDING
+            shelf_h = 0
+        positions[i] = (x, y)
+        x += w + PADDING
+        shelf_h = max(shelf_h, h)
+    return positions, (width, y + shelf_h)
+
+def build(sheet_path, out_path, prefix="cat"):
+    img = chroma_key(pygame.image.load(sheet_path))
+    boxes = find_frames(img)
+    print(f"{sheet_path}: {len(boxes)} frames")
+
+    # Every frame also gets a mirrored twin, so the cat can face either way
+    names = []
+    surfaces = []
+    for i, box in enumerate(boxes):
+        frame = img.subsurface(box)
+        names += [f"{prefix}_{i}", f"{prefix}_{i}_flip"]
+        surfaces += [frame, pygame.transform.flip(frame, True, False)]
+
+    positions, size = pack([s.get_size() for s in surfaces])
+    atlas = pygame.Surface(size, pygame.SRCALPHA)
+    atlas.fill((0, 0, 0, 0))
+    frames = {}
+    for name, surf, pos in zip(names, surfaces, positions):
+        atlas.blit(surf, pos)
+        w, h = surf.get_size()
+        frames[name] = {
+            "rect": [pos[0], pos[1], w, h],
+            "anchor": [w // 2, h], # bottom centre: where the paws touch the ground
+        }
+
+    pygame.image.save(atlas, out_path)
+    manifest = {
+        "image": os.path.basename(out_path),
+        "source": os.path.basename(sheet_path),
+        "size": list(size),
+        "order": [n for n in names if not n.endswith("_flip")],
+        "frames": frames,
+    }
+    manifest_path = os.path.splitext(out_path)[0] + ".json"
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Saved {size[0]}x{size[1]} atlas to {out_path} and manifest to {manifest_path}")
+
+def write_blob(img, path):
+    # Raw BGRA pixels behind a small header, see BLOB_HEADER in cozy_widget.
+    # Written next to path and renamed over it, so an interrupted build
+    # never leaves a partial blob behind
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(BLOB_HEADER.pack(BLOB_MAGIC, *img.get_size()))
+        f.write(pygame.image.tobytes(img, "BGRA"))
+    os.replace(tmp, path)
+
+def build_blobs(paths):
+    for path in paths:
+        blob = os.path.splitext(path)[0] + BLOB_EXT
+        img = pygame.image.load(path)
+        write_blob(img, blob)
+        print(f"Saved {img.get_width()}x{img.get_height()} blob to {blob}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack the cat sprite sheet into an atlas + manifest")
+    parser.add_argument("--sheet", default=os.path.join("assets", "cat_sprite_sheet.png"))
+    parser.add_argument("--out", default=os.path.join("assets", "cat_atlas.png"))
+    parser.add_argument("--prefix", default="cat", help="frame name prefix in the manifest")
+    parser.add_argument("--blobs", action="store_true",
+                        help="also write precompiled blobs of the atlas and the other widget images")
+    args = parser.parse_args()
+    build(args.sheet, args.out, args.prefix)
+    if args.blobs:
+        asset_dir = os.path.dirname(args.out)
+        build_blobs([args.out] + [os.path.join(asset_dir, name) for name in BLOB_IMAGES])
+
+if __name__ == "__main__":
+    main()
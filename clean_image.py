@@ -1,44 +1,145 @@
 import pygame
+import numpy as np
+import argparse
+import glob
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-pygame.init()
-screen = pygame.display.set_mode((100, 100)) # Init display for convert support
+# Batch chroma-key tool: makes the key-coloured background of sprite sheets
+# transparent, using NumPy masks over the whole image instead of per-pixel
+# get_at/set_at.
+#
+#   python clean_image.py      (assets/cat_sprite_sheet.png -> assets/cat_sprites_clean.png)
+#   python clean_image.py "art/*.png" art/sheets --out assets/clean --key 0,255,0 --tolerance 40 --feather 20
+#
+# Outputs whose source and settings are unchanged since the last run are skipped.
 
 img_path = 'assets/cat_sprite_sheet.png'
 save_path = 'assets/cat_sprites_clean.png'
 
-if os.path.exists(img_path):
-    img = pygame.image.load(img_path).convert()
-    w, h = img.get_size()
-    print(f"Original Size: {w}x{h}")
-    
-    # Create new surface with alpha
-    clean_img = pygame.Surface((w, h), pygame.SRCALPHA)
-    clean_img.fill((0,0,0,0))
-    
-    # Iterate and copy (slow but fine for one-time offline processing)
-    # Actually, let's just use Pygame's efficient array manipulation if possible, 
-    # OR since it's small, per-pixel is instant.
-    
-    # Target
-    for y in range(h):
-        for x in range(w):
-            color = img.get_at((x, y))
-            r, g, b, a = color
-            
-            # Heuristic: High R/B, Low G = Magenta-ish
-            is_magenta_ish = (r > 100 and b > 100 and g < 100)
-            
-            if not is_magenta_ish:
-                clean_img.set_at((x, y), color)
-            # Else transparent
-            
-    pygame.image.save(clean_img, save_path)
-    print(f"Saved cleaned image to {save_path}")
-    
-    # Suggest sprite dimensions
-    print(f"Suggested sprite width: {w//3}")
-    print(f"Suggested sprite height: {h}")
-    
-else:
-    print("File not found")
+# output path -> source/settings hash, kept in the working directory rather
+# than next to the outputs, so it never ends up in assets/ (or the bundle)
+CACHE_FILE = '.clean_image_cache.json'
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tga')
+OUTPUT_SUFFIX = '_clean' # <stem>_clean.png
+
+def key_distance(rgb, key=None, tolerance=0):
+    # How far each pixel is from being background; <= 0 means keyed out.
+    # key=None is the magenta heuristic: High R/B, Low G = Magenta-ish
+    rgb = rgb.astype(np.int16)
+    if key is None:
+        return np.maximum(np.maximum(101 - rgb[..., 0], 101 - rgb[..., 2]), rgb[..., 1] - 99)
+    return np.abs(rgb - np.array(key, dtype=np.int16)).max(axis=2) - tolerance
+
+def chroma_key(img, key=None, tolerance=0, feather=0):
+    # Returns an SRCALPHA copy with the background transparent. feather ramps
+    # alpha over that many colour steps past the key, softening JPEG edges.
+    # A plain SRCALPHA copy, so no display is needed for convert_alpha()
+    out = pygame.Surface(img.get_size(), pygame.SRCALPHA)
+    out.blit(img, (0, 0))
+    dist = key_distance(pygame.surfarray.pixels3d(out), key, tolerance)
+    alpha = pygame.surfarray.pixels_alpha(out)
+    if feather > 0:
+        keep = np.clip(dist / feather, 0.0, 1.0)
+        alpha[:] = (alpha * keep).astype(np.uint8)
+    else:
+        alpha[dist <= 0] = 0
+    del alpha
+    return out
+
+def clean_file(src, dst, key=None, tolerance=0, feather=0):
+    img = pygame.image.load(src)
+    pygame.image.save(chroma_key(img, key, tolerance, feather), dst)
+    return src, dst, img.get_size()
+
+def find_inputs(patterns, outputs=()):
+    # Globs and directories (every image directly inside) -> sorted file list,
+    # without this tool's own outputs (the suffix, or listed in outputs), so
+    # cleaning a folder again doesn't clean its cleaned copies
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for name in os.listdir(pattern):
+                if name.lower().endswith(IMAGE_EXTS):
+                    files.add(os.path.join(pattern, name))
+        else:
+            files.update(glob.glob(pattern))
+    return sorted(f for f in files if not is_output(f, outputs))
+
+def is_output(path, outputs=()):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem.endswith(OUTPUT_SUFFIX) or os.path.normpath(path) in outputs
+
+def output_path(src, out_dir):
+    stem = os.path.splitext(os.path.basename(src))[0]
+    return os.path.join(out_dir or os.path.dirname(src), f"{stem}{OUTPUT_SUFFIX}.png")
+
+def source_hash(src, settings):
+    h = hashlib.sha256(settings.encode())
+    with open(src, 'rb') as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+def load_cache():
+    try:
+        with open(CACHE_FILE) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def parse_color(text):
+    parts = [int(p) for p in text.split(',')]
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError("expected R,G,B")
+    return tuple(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Make sprite sheet backgrounds transparent")
+    parser.add_argument("inputs", nargs="*", help="image files, globs or directories")
+    parser.add_argument("--out", help="output directory (default: next to each source)")
+    parser.add_argument("--key", type=parse_color, help="background colour R,G,B (default: magenta heuristic)")
+    parser.add_argument("--tolerance", type=int, default=60, help="max channel difference from --key still keyed out")
+    parser.add_argument("--feather", type=int, default=0, help="colour steps over which edges fade in")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the source is unchanged")
+    args = parser.parse_args()
+
+    cache = load_cache()
+    if args.inputs:
+        jobs = [(src, output_path(src, args.out)) for src in find_inputs(args.inputs, cache)]
+    else:
+        jobs = [(img_path, save_path)]
+    jobs = [(src, dst) for src, dst in jobs if os.path.exists(src)]
+    if not jobs:
+        print("File not found")
+        return
+
+    tolerance = args.tolerance if args.key else 0
+    settings = json.dumps([args.key, tolerance, args.feather])
+
+    # Skip outputs that were built from exactly this source and settings
+    todo = []
+    for src, dst in jobs:
+        os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+        digest = source_hash(src, settings)
+        name = os.path.normpath(dst)
+        if not args.force and os.path.exists(dst) and cache.get(name) == digest:
+            print(f"Up to date: {dst}")
+            continue
+        todo.append((src, dst, name, digest))
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(clean_file, src, dst, args.key, tolerance, args.feather)
+                   for src, dst, _, _ in todo]
+        for (src, dst, name, digest), future in zip(todo, futures):
+            _, _, (w, h) = future.result()
+            cache[name] = digest
+            print(f"Saved cleaned image to {dst} ({w}x{h})")
+
+    with open(CACHE_FILE, 'w') as f:
+        json.dump(cache, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,18 @@ import random
 import os
 import sys
 import math
+import time
+import json
+import heapq
+import struct
+import gzip
+import zlib
+import argparse
+from bisect import bisect
+from itertools import accumulate
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, OrderedDict, deque
+import numpy as np
 
 # Configuration
 WINDOW_WIDTH = 400
@@ -10,366 +22,2363 @@ WINDOW_HEIGHT = 300
 FPS = 60
 FIREFLY_COUNT = 15
 
+# Frame rates per scheduler mode (0 = only wake for input or the next state change)
+ACTIVE_FPS = FPS   # dragging, resizing, walking
+AMBIENT_FPS = 15   # only fireflies moving
+IDLE_FPS = 0       # nothing animating
+IDLE_MAX_WAIT = 1000 # ms, upper bound on a single idle sleep
+
+# Simulation runs in fixed steps, independent of the render rate
+SIM_HZ = 60
+SIM_DT = 1.0 / SIM_HZ
+MAX_CATCHUP = 2.0 # seconds; longer stalls are dropped instead of replayed
+
+# Cat timings (seconds) and speed (pixels per second)
+IDLE_MIN = 15 * 60
+IDLE_MAX = 35 * 60
+CAT_SPEED = 96.0 # 1.6 px per 60 FPS frame
+CAT_BOB_RATE = 15.0 # radians per second
+COMPANIONS = 1 # cats per widget
+
+# Cat behaviour table. When an idle spell ends the cat picks one entry by
+# weight: walk somewhere (WALK) or switch to a pose - 0 = sit (the user hates
+# it), 1 = lick, 2 = sleep (both loved). At start and after every walk it
+# settles into one of SETTLE_POSES. Each idle spell lasts IDLE_MIN..IDLE_MAX.
+WALK = "walk"
+IDLE_CHOICES = (
+    # (weight, outcome): half walks, half poses with sit at 1 in 51
+    (51, WALK),
+    (1, 0),
+    (25, 1),
+    (25, 2),
+)
+SETTLE_POSES = ((1, 1), (1, 2))
+
+# Scale-on-present: draw the scene once at LOGICAL_SIZE and scale the finished
+# frame to the window, so resizing never rescales assets.
+# None keeps the per-size assets; otherwise "nearest", "smooth" or "integer"
+# (whole-pixel multiples, centred with black bars). Set with COZY_PRESENT_MODE
+# or --present ("none" for None).
+PRESENT_MODES = ("nearest", "smooth", "integer")
+PRESENT_MODE = os.environ.get("COZY_PRESENT_MODE", "none").lower()
+PRESENT_MODE = PRESENT_MODE if PRESENT_MODE != "none" else None
+LOGICAL_SIZE = (WINDOW_WIDTH, WINDOW_HEIGHT)
+
+# Scaled assets: final quality filter, the cheap one used while dragging the
+# resize grip, how long the size must hold before the final rescale, and the
+# memory bound of the scaled-asset cache
+SCALE_FILTER = "smooth" # "smooth" or "nearest"
+PREVIEW_FILTER = "nearest"
+RESIZE_DEBOUNCE_MS = 150
+ASSET_CACHE_BYTES = 32 * 1024 * 1024
+CAT_HEIGHT = 70 # pixels, cat frames keep their aspect ratio
+
+# Cat frame table index: frames[facing][pose]
+FACING_RIGHT = 0 # as drawn in the sheet
+FACING_LEFT = 1
+
+# Frame profiler: per-phase timings, frame-time histogram and dropped frames.
+# Off unless PROFILE_LOG is set (a .csv or .jsonl file every frame is streamed
+# to) or the overlay is toggled on with PROFILE_HOTKEY.
+PROFILE_LOG = os.environ.get("COZY_PROFILE_LOG")
+PROFILE_HOTKEY = pygame.K_F3
+PROFILE_HISTORY = 300 # frames in the rolling window
+PROFILE_BINS = (1, 2, 4, 8, 16, 33, 66) # histogram bucket edges, ms
+
+# Above this many changed regions a full repaint is cheaper than clipping
+MAX_DIRTY_RECTS = 64
+
+# Render backend, chosen at startup: "surface" blits into the display surface
+# (dirty rects); "texture" draws through pygame._sdl2.video, with assets
+# uploaded once as textures and scaled, mirrored and faded by the renderer.
+# Falls back to "surface" if no renderer can be created. SDL_RENDER_DRIVER=software
+# forces SDL's software renderer.
+RENDER_BACKEND = os.environ.get("COZY_RENDERER", "surface")
+WINDOW_TITLE = "Cozy Widget"
+
+# Widgets run by one process (e.g. one per monitor), sharing decoded and
+# scaled assets and one frame loop. More than one needs the texture renderer,
+# the only one that can open several windows.
+WIDGETS = int(os.environ.get("COZY_WIDGETS", 1))
+WIDGET_CASCADE = 40 # px between the initial positions of the windows
+
+# Day/night lighting: the background is tinted for the time of day through a
+# per-channel lookup table. The day is cut into LIGHTING_STEPS steps; a new
+# tinted background is made (and cached per window size) only when the step
+# changes, then cross-faded in over LIGHTING_FADE_MS. COZY_LIGHTING is "clock"
+# (follow local time), "off", or the hour to start the day at (e.g. 19.5).
+LIGHTING = os.environ.get("COZY_LIGHTING", "clock")
+LIGHTING_STEPS = 96 # every 15 minutes
+LIGHTING_FADE_MS = 2000
+# name -> (channel gain, gamma, channel lift, firefly brightness)
+LIGHTING_PRESETS = {
+    "night": ((0.35, 0.42, 0.62), 1.25, (0, 2, 12), 1.0),
+    "dawn": ((1.0, 0.82, 0.78), 1.05, (14, 6, 0), 0.6),
+    "day": ((1.0, 1.0, 1.0), 1.0, (0, 0, 0), 0.3),
+    "dusk": ((0.95, 0.68, 0.62), 1.1, (12, 0, 10), 0.75),
+}
+# (hour, preset) keyframes; steps in between blend the two presets around them
+LIGHTING_KEYS = ((0, "night"), (5, "night"), (7, "dawn"), (9, "day"), (17, "day"),
+                 (19, "dusk"), (21, "night"), (24, "night"))
+
+# Firefly sprite bank
+FIREFLY_SIZE = 10 # pixels
+FIREFLY_ALPHA_LEVELS = 16 # pre-faded copies, so each firefly keeps its own alpha
+FIREFLY_GLOW = True
+FIREFLY_GLOW_SCALE = 2.4 # halo diameter relative to the sprite
+FIREFLY_GLOW_COLOR = (120, 100, 40) # added on top of the scene at full brightness
+
+# Quality governor: keeps the widget within a CPU budget (share of one core,
+# work time / wall time) and a frame-time budget (90th percentile of the work
+# per frame) by stepping down QUALITY_LEVELS, best first. It decides once per
+# GOVERNOR_WINDOW_MS and steps back up after GOVERNOR_CALM_WINDOWS windows in
+# a row below GOVERNOR_HEADROOM of the budget. Both budgets can be set per
+# machine with COZY_CPU_BUDGET and COZY_FRAME_BUDGET_MS.
+CPU_BUDGET = float(os.environ.get("COZY_CPU_BUDGET", 0.10))
+FRAME_BUDGET_MS = float(os.environ.get("COZY_FRAME_BUDGET_MS", 8.0))
+GOVERNOR_WINDOW_MS = 2000
+GOVERNOR_HEADROOM = 0.5
+GOVERNOR_CALM_WINDOWS = 5
+QUALITY_LEVELS = (
+    # fireflies: share of FIREFLY_COUNT kept; fps: frame rate cap
+    {"glow": True, "fps": ACTIVE_FPS, "fireflies": 1.0, "filter": "smooth"},
+    {"glow": False, "fps": ACTIVE_FPS, "fireflies": 1.0, "filter": "smooth"},
+    {"glow": False, "fps": 30, "fireflies": 1.0, "filter": "smooth"},
+    {"glow": False, "fps": 30, "fireflies": 0.5, "filter": "nearest"},
+    {"glow": False, "fps": 15, "fireflies": 0.25, "filter": "nearest"},
+)
+
+# Startup: worker threads decoding assets and the time-to-first-frame budget
+# the startup report checks against
+LOAD_WORKERS = 4
+STARTUP_BUDGET_MS = 250
+
+# Precompiled assets (build_atlas.py --blobs): raw pixels in the 32-bit BGRA
+# layout displays usually use, so loading is a file read instead of a PNG
+# decode and convert() is little more than a copy. Used when newer than the PNG.
+BLOB_EXT = ".bgra"
+BLOB_MAGIC = b"CZB1"
+BLOB_HEADER = struct.Struct("<4sII") # magic, width, height
+
+# Session recording: COZY_RECORD (or --record) names a log of every frame's
+# outside inputs - events, cursor and window reads, sim steps, quality level -
+# plus a checksum of the frame, replayed headless with --replay. The log is a
+# gzip stream: REPLAY_HEADER, then per frame REPLAY_FRAME followed by its
+# cursor reads (REPLAY_POINT), window rect reads (REPLAY_RECT) and events
+# (REPLAY_EVENT: kind = index into REPLAY_EVENTS, x, y, button or key).
+RECORD_LOG = os.environ.get("COZY_RECORD")
+REPLAY_MAGIC = b"CZR2"
+REPLAY_HEADER = struct.Struct("<4sQHHHHd") # magic, seed, width, height, fireflies, companions, hour (NaN: no lighting)
+REPLAY_FRAME = struct.Struct("<IHdBHHIBBH") # ticks, steps, t, quality, width, height, crc32, cursor reads, rect reads, events
+REPLAY_POINT = struct.Struct("<ii")
+REPLAY_RECT = struct.Struct("<iiii")
+REPLAY_EVENT = struct.Struct("<Bhhi")
+REPLAY_EVENTS = (pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+                 pygame.MOUSEMOTION, pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED)
+
 # Colors
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 
-class Firefly:
-    def __init__(self, image):
-        self.image = image
-        self.rect = self.image.get_rect()
-        self.x = random.randint(0, WINDOW_WIDTH)
-        self.y = random.randint(0, WINDOW_HEIGHT)
-        self.vx = random.uniform(-0.5, 0.5)
-        self.vy = random.uniform(-0.5, 0.5)
-        self.timer = random.randint(0, 100)
-        self.alpha = random.randint(100, 255)
-        self.alpha_speed = random.choice([-2, 2])
+class FireflySpriteBank:
+    # Every firefly image the swarm can draw, built once: the sprite at
+    # FIREFLY_ALPHA_LEVELS brightness steps with per-pixel alpha (no colorkey +
+    # surface alpha blend at draw time), plus matching additive glow halos.
+    def __init__(self, source, size=FIREFLY_SIZE, levels=FIREFLY_ALPHA_LEVELS, glow=FIREFLY_GLOW):
+        self.source = source
+        self.levels = levels
+        self.glow = glow
+        self.size = None
+        self.set_size(size)
+
+    def set_size(self, size):
+        # Rebuilding is the expensive part, so only do it when the scale changes
+        if size == self.size:
+            return False
+        self.size = size
+        self._build()
+        return True
+
+    def set_glow(self, glow):
+        if glow == self.glow:
+            return False
+        self.glow = glow
+        self._build()
+        return True
+
+    def _build(self):
+        base = pygame.transform.scale(self.source, (self.size, self.size)).convert_alpha()
+        key = self.source.get_colorkey()
+        if key is not None:
+            # The JPEG background is only roughly the key colour, so fade alpha
+            # with distance from it instead of cutting out exact matches
+            rgb = pygame.surfarray.pixels3d(base).astype(np.int16)
+            dist = np.abs(rgb - np.array(key[:3], dtype=np.int16)).max(axis=2)
+            del rgb
+            pygame.surfarray.pixels_alpha(base)[:] = np.clip(dist * 2, 0, 255).astype(np.uint8)
+        self.images = []
+        for i in range(self.levels):
+            a = int(255 * i / (self.levels - 1))
+            img = base.copy()
+            img.fill((255, 255, 255, a), special_flags=pygame.BLEND_RGBA_MULT)
+            self.images.append(img)
+
+        self.glows = []
+        glow_size = int(self.size * FIREFLY_GLOW_SCALE) if self.glow else self.size
+        if self.glow:
+            # Radial falloff, black at the edge so BLEND_ADD leaves the scene untouched there
+            r = glow_size / 2
+            yy, xx = np.mgrid[0:glow_size, 0:glow_size]
+            d = np.hypot(xx - r + 0.5, yy - r + 0.5) / r
+            falloff = np.clip(1.0 - d, 0.0, 1.0) ** 2
+            for i in range(self.levels):
+                k = falloff * (i / (self.levels - 1))
+                rgb = (k[..., None] * np.array(FIREFLY_GLOW_COLOR)).astype(np.uint8)
+                self.glows.append(pygame.surfarray.make_surface(rgb.transpose(1, 0, 2)).convert())
+
+        # Everything is drawn centred inside one extent rect
+        self.extent = (glow_size, glow_size)
+        self.sprite_offset = ((glow_size - self.size) // 2, (glow_size - self.size) // 2)
+
+    def memory_bytes(self):
+        return sum(s.get_width() * s.get_height() * s.get_bytesize() for s in self.images + self.glows)
+
+class FireflySwarm:
+    # Struct-of-arrays particle system: every firefly lives in a slot of the
+    # NumPy arrays below and one vectorized step moves all of them.
+    # Speeds are per second (the old per-frame values times 60).
+    # set_active(n) keeps only the first n flying; the arrays below are views
+    # into the full pool, so the others resume where they were.
+    STATE = ("x", "y", "prev_x", "prev_y", "vx", "vy", "alpha", "alpha_speed")
+
+    def __init__(self, bank, count, w, h, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.w = w
+        self.h = h
+        x = self.rng.uniform(0, w, count)
+        y = self.rng.uniform(0, h, count)
+        self.pool = {
+            "x": x,
+            "y": y,
+            "prev_x": x.copy(),
+            "prev_y": y.copy(),
+            "vx": self.rng.uniform(-30, 30, count),
+            "vy": self.rng.uniform(-30, 30, count),
+            "alpha": self.rng.uniform(100, 255, count),
+            "alpha_speed": self.rng.choice([-120.0, 120.0], count),
+        }
+        self.set_active(count)
+        self.draw_x = np.zeros(count, dtype=int)
+        self.draw_y = np.zeros(count, dtype=int)
+        self.drawn = [] # rects of the last draw, for the dirty renderer
+        self.layout = None # (levels, positions, rects) to draw, see _layout
+        self.changed = True
+        self.brightness = 1.0 # scales every firefly's alpha (day/night lighting)
+        self.set_bank(bank)
+        self.interpolate(0.0)
+
+    def __len__(self):
+        return len(self.x)
+
+    def set_active(self, n):
+        for name in self.STATE:
+            setattr(self, name, self.pool[name][:n])
+        self.changed = True
+
+    def set_bank(self, bank):
+        self.bank = bank
+        self.size = bank.extent
+        self.changed = True
+
+    def set_bounds(self, w, h):
+        # Pull fireflies back in after a resize (resting ones too)
+        self.w = w
+        self.h = h
+        pool = self.pool
+        np.minimum(pool["x"], w, out=pool["x"])
+        np.minimum(pool["y"], h, out=pool["y"])
+        pool["prev_x"][:] = pool["x"]
+        pool["prev_y"][:] = pool["y"]
+        self.changed = True
+
+    def update(self, dt):
+        n = len(self.x)
+        self.prev_x[:] = self.x
+        self.prev_y[:] = self.y
+        self.x += self.vx * dt
+        self.y += self.vy * dt
+
+        # Gentle random direction change (about 5% of fireflies per step)
+        turn = self.rng.random(n) < 0.05
+        k = int(turn.sum())
+        if k:
+            self.vx[turn] += self.rng.uniform(-6, 6, k)
+            self.vy[turn] += self.rng.uniform(-6, 6, k)
 
-    def update(self):
-        # Movement
-        self.x += self.vx
-        self.y += self.vy
-        
-        # Gentle random direction change
-        if random.random() < 0.05:
-            self.vx += random.uniform(-0.1, 0.1)
-            self.vy += random.uniform(-0.1, 0.1)
-        
         # Clamp velocity
-        self.vx = max(-1.0, min(1.0, self.vx))
-        self.vy = max(-1.0, min(1.0, self.vy))
+        np.clip(self.vx, -60.0, 60.0, out=self.vx)
+        np.clip(self.vy, -60.0, 60.0, out=self.vy)
 
-        # Bounce off edges
-        if self.x < 0 or self.x > WINDOW_WIDTH: self.vx *= -1
-        if self.y < 0 or self.y > WINDOW_HEIGHT: self.vy *= -1
-        
-        # Keep in bounds
-        self.x = max(0, min(WINDOW_WIDTH, self.x))
-        self.y = max(0, min(WINDOW_HEIGHT, self.y))
-        
-        self.rect.center = (int(self.x), int(self.y))
+        # Bounce off edges and keep in bounds
+        self.vx[(self.x < 0) | (self.x > self.w)] *= -1
+        self.vy[(self.y < 0) | (self.y > self.h)] *= -1
+        np.clip(self.x, 0, self.w, out=self.x)
+        np.clip(self.y, 0, self.h, out=self.y)
 
         # Twinkle effect
-        self.alpha += self.alpha_speed
-        if self.alpha >= 255:
-            self.alpha = 255
-            self.alpha_speed = -2
-        elif self.alpha <= 50:
-            self.alpha = 50
-            self.alpha_speed = 2
-            
-        self.image.set_alpha(self.alpha)
+        self.alpha += self.alpha_speed * dt
+        top = self.alpha >= 255
+        bottom = self.alpha <= 50
+        self.alpha[top] = 255
+        self.alpha_speed[top] = -120
+        self.alpha[bottom] = 50
+        self.alpha_speed[bottom] = 120
+        self.changed = True
 
-    def draw(self, surface):
-        surface.blit(self.image, self.rect)
+    def interpolate(self, t):
+        # Top-left draw positions between the last two sim steps (t in [0, 1))
+        w, h = self.size
+        self.draw_x = (self.prev_x + (self.x - self.prev_x) * t - w / 2).astype(int)
+        self.draw_y = (self.prev_y + (self.y - self.prev_y) * t - h / 2).astype(int)
+        self.changed = True
 
-import ctypes
-from ctypes import windll, byref, Structure, c_long, c_int, wintypes
+    def changed_rects(self, limit):
+        # Old and new rects of every firefly, or None if that exceeds limit
+        if not self.changed:
+            return []
+        if 2 * len(self.x) > limit:
+            return None
+        old = self.drawn # _layout replaces it
+        return old + self._layout()[2]
 
-class POINT(Structure):
-    _fields_ = [("x", c_long), ("y", c_long)]
+    def _rects(self, positions):
+        w, h = self.size
+        return [pygame.Rect(x, y, w, h) for x, y in positions]
 
-def queryMousePosition():
-    pt = POINT()
-    windll.user32.GetCursorPos(byref(pt))
-    return pt
+    def _layout(self):
+        # Brightness level, position and rect of every firefly, worked out once
+        # per change however many dirty regions they are drawn into. Rects are
+        # only made up front for swarms small enough for the dirty renderer.
+        if self.changed or self.layout is None:
+            levels = (self.alpha * (self.brightness * (self.bank.levels - 1) / 255)).astype(int).tolist()
+            positions = list(zip(self.draw_x.tolist(), self.draw_y.tolist()))
+            rects = self._rects(positions) if 2 * len(positions) <= MAX_DIRTY_RECTS else None
+            self.layout = (levels, positions, rects)
+            self.drawn = rects or []
+            self.changed = False
+        return self.layout
 
-def set_window_position(hwnd, x, y, width, height):
-    # SWP_NOZORDER (0x0004) | SWP_NOACTIVATE (0x0010)
-    windll.user32.SetWindowPos(hwnd, 0, x, y, width, height, 0x0014)
+    def draw(self, surface, area=None):
+        # Every firefly, or with area only those overlapping it
+        levels, positions, rects = self._layout()
+        if area is not None:
+            if rects is None:
+                rects = self._rects(positions)
+                self.layout = (levels, positions, rects)
+            hit = area.collidelistall(rects)
+            levels = [levels[i] for i in hit]
+            positions = [positions[i] for i in hit]
+        bank = self.bank
+        if bank.glows:
+            glows = bank.glows
+            surface.blits([(glows[l], p, None, pygame.BLEND_ADD) for l, p in zip(levels, positions)], doreturn=False)
+        images = bank.images
+        ox, oy = bank.sprite_offset
+        surface.blits([(images[l], (x + ox, y + oy)) for l, (x, y) in zip(levels, positions)], doreturn=False)
 
-def main():
-    global WINDOW_WIDTH, WINDOW_HEIGHT
-    pygame.init()
-    
-    # Initial dimensions
-    current_w = WINDOW_WIDTH
-    current_h = WINDOW_HEIGHT
-    
-    # Setup window - No frame for widget look
-    screen = pygame.display.set_mode((current_w, current_h), pygame.NOFRAME)
-    pygame.display.set_caption("Cozy Widget")
-    clock = pygame.time.Clock()
-    
-    # Get Window Handle
-    hwnd = pygame.display.get_wm_info()['window']
+    def draw_textured(self, screen):
+        # One full-brightness sprite and glow texture, faded per firefly by the renderer
+        bank = self.bank
+        sprite = bank.images[-1]
+        glow = bank.glows[-1] if bank.glows else None
+        ox, oy = bank.sprite_offset
+        size = (bank.size, bank.size)
+        alphas = (self.alpha * self.brightness).astype(int).tolist()
+        for x, y, a in zip(self.draw_x.tolist(), self.draw_y.tolist(), alphas):
+            if glow:
+                screen.draw(glow, (x, y) + bank.extent, brightness=a, additive=True)
+            screen.draw(sprite, (x + ox, y + oy) + size, alpha=a)
+        self.changed = False
 
-    # Load Assets
-    if getattr(sys, 'frozen', False):
-        asset_dir = os.path.join(sys._MEIPASS, 'assets')
+def ticks_ms():
+    # Monotonic milliseconds. pygame.time.get_ticks() stays 0 unless
+    # pygame.init() started SDL's timer, which the widget skips.
+    return int(time.monotonic() * 1000)
+
+# Surfaces made by our own scaling/flipping code; the debug stats report how
+# many were made after the first frame (the steady-state loop should make none)
+surface_allocs = 0
+
+def count_alloc(surf):
+    global surface_allocs
+    surface_allocs += 1
+    return surf
+
+def preset_lut(gain, gamma, lift):
+    # 3 x 256 table: channel value -> lift + gain * value ** gamma
+    v = (np.arange(256) / 255.0) ** gamma
+    lut = np.array(lift, dtype=float)[:, None] + np.array(gain)[:, None] * v[None, :] * 255
+    return np.clip(lut, 0, 255)
+
+def apply_lut(surf, lut):
+    # A copy of surf with every channel mapped through lut (3 x 256 uint8)
+    out = surf.copy()
+    rgb = pygame.surfarray.pixels3d(out)
+    for c in range(3):
+        rgb[..., c] = lut[c][rgb[..., c]]
+    del rgb
+    return count_alloc(out)
+
+class DayLighting:
+    # Background tint and firefly brightness for the time of day, start_hour
+    # plus the scene clock's ms. The preset tables are built once and each
+    # step's blend of two of them is cached; tinting itself happens once per
+    # step and size (AssetCache.tinted).
+    def __init__(self, start_hour):
+        self.start_hour = start_hour % 24
+        self.presets = {name: preset_lut(gain, gamma, lift) for name, (gain, gamma, lift, _) in LIGHTING_PRESETS.items()}
+        self.luts = {}
+
+    def _hours(self, ms):
+        return self.start_hour + ms / 3600000
+
+    def step_at(self, ms):
+        return int(self._hours(ms) % 24 * LIGHTING_STEPS / 24)
+
+    def ms_to_next_step(self, ms):
+        step_hours = 24 / LIGHTING_STEPS
+        hours = self._hours(ms)
+        return ((hours // step_hours + 1) * step_hours - hours) * 3600000
+
+    def _blend(self, step):
+        # The two keyframe presets around the middle of step, and how far between them
+        hour = (step + 0.5) * 24 / LIGHTING_STEPS
+        for (h0, a), (h1, b) in zip(LIGHTING_KEYS, LIGHTING_KEYS[1:]):
+            if hour < h1:
+                return a, b, (hour - h0) / (h1 - h0)
+        return LIGHTING_KEYS[-1][1], LIGHTING_KEYS[-1][1], 0.0
+
+    def lut(self, step):
+        lut = self.luts.get(step)
+        if lut is None:
+            a, b, w = self._blend(step)
+            lut = self.luts[step] = (self.presets[a] * (1 - w) + self.presets[b] * w).round().astype(np.uint8)
+        return lut
+
+    def firefly_brightness(self, step):
+        a, b, w = self._blend(step)
+        return LIGHTING_PRESETS[a][3] * (1 - w) + LIGHTING_PRESETS[b][3] * w
+
+def lighting_start_hour(setting=LIGHTING):
+    # The hour the widget's day starts at, or None with lighting off
+    if setting == "off":
+        return None
+    if setting == "clock":
+        now = time.localtime()
+        return now.tm_hour + now.tm_min / 60 + now.tm_sec / 3600
+    return float(setting)
+
+def scale_surface(surf, size, filter):
+    if filter == "smooth":
+        return count_alloc(pygame.transform.smoothscale(surf, size))
+    return count_alloc(pygame.transform.scale(surf, size))
+
+class AssetCache:
+    # Decoded originals keyed by (asset,) and scaled surfaces keyed by (asset,
+    # size, filter), shared by every scene built on the cache. Scenes say which
+    # entries they use with hold(); entries nobody holds are evicted least
+    # recently used first once the cache takes more than max_bytes, held ones
+    # never. Getters given an owner hold the entry for it right away, so
+    # fetching the rest of a set cannot evict it before hold() lists the
+    # whole set. Crop boxes are kept per source frame for good, they are tiny and
+    # never change. Cached surfaces are shared, so never draw into them.
+    def __init__(self, max_bytes=ASSET_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict() # key -> surface, oldest first
+        self.keys = {} # id(surface) -> key, for hold()
+        self.holders = {} # owner -> keys it holds
+        self.refs = Counter() # key -> number of holders
+        self.bytes = 0
+        self.crop_boxes = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def original(self, name, make, owner=None):
+        # The decoded asset in display format, made once by make()
+        return self._get((name,), make, owner)
+
+    def scaled(self, name, source, size, filter, owner=None):
+        return self._get((name, size, filter), lambda: scale_surface(source, size, filter), owner)
+
+    def tinted(self, key, source, step, lut, owner=None):
+        # source through a lighting step's LUT; key names source, like the
+        # (name, size, filter) it was scaled under (source may since be evicted)
+        return self._get(key + ("lit", step), lambda: apply_lut(source, lut), owner)
+
+    def mirrored(self, name, surf, filter, owner=None):
+        # Horizontally flipped copy of an already scaled frame
+        return self._get((name, surf.get_size(), filter, "flip"),
+                         lambda: count_alloc(pygame.transform.flip(surf, True, False)), owner)
+
+    def _get(self, key, make, owner=None):
+        surf = self.entries.get(key)
+        if surf is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+            surf = make()
+            self.entries[key] = surf
+            self.keys[id(surf)] = key
+            self.bytes += surface_bytes(surf)
+        if owner is not None:
+            self._hold_key(owner, key)
+        self._evict(keep=key)
+        return surf
+
+    def _hold_key(self, owner, key):
+        keys = self.holders.setdefault(owner, set())
+        if key not in keys:
+            keys.add(key)
+            self.refs[key] += 1
+
+    def _evict(self, keep=None):
+        # Oldest first, skipping held entries (and keep, the entry just made)
+        for key in list(self.entries):
+            if self.bytes <= self.max_bytes:
+                break
+            if key == keep or self.refs[key]:
+                continue
+            old = self.entries.pop(key)
+            del self.keys[id(old)]
+            self.bytes -= surface_bytes(old)
+            self.evictions += 1
+
+    def hold(self, owner, surfaces):
+        # owner now uses exactly these surfaces (ones not from this cache are
+        # ignored); what it held before, or fetched for itself since, and no
+        # longer lists is let go
+        keys = {self.keys[id(s)] for s in surfaces if id(s) in self.keys}
+        old = self.holders.pop(owner, set())
+        for key in keys - old:
+            self.refs[key] += 1
+        for key in old - keys:
+            self.refs[key] -= 1
+            if not self.refs[key]:
+                del self.refs[key]
+        if keys:
+            self.holders[owner] = keys
+        self._evict()
+
+    def release(self, owner):
+        self.hold(owner, ())
+
+    def resident(self):
+        # Surface bytes per asset, with how many copies (sizes and filters)
+        # and how many holders
+        result = {}
+        for key, surf in self.entries.items():
+            usage = result.setdefault(key[0], {"bytes": 0, "copies": 0, "holders": 0})
+            usage["bytes"] += surface_bytes(surf)
+            usage["copies"] += 1
+        for keys in self.holders.values():
+            for name in {key[0] for key in keys}:
+                result[name]["holders"] += 1
+        return result
+
+    def crop_box(self, name, surf):
+        # Bounding box of the visible pixels, found with a mask only once per frame
+        box = self.crop_boxes.get(name)
+        if box is None:
+            rects = pygame.mask.from_surface(surf).get_bounding_rects()
+            # Union all rects to get the full bounding box
+            box = rects[0].unionall(rects) if rects else surf.get_rect()
+            self.crop_boxes[name] = box
+        return box
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "holders": len(self.holders),
+        }
+
+def surface_bytes(surf):
+    return surf.get_width() * surf.get_height() * surf.get_bytesize()
+
+def present_display(rects=None):
+    if rects is None:
+        pygame.display.flip()
     else:
-        asset_dir = os.path.join(os.path.dirname(__file__), 'assets')
-    
+        pygame.display.update(rects)
+
+class CanvasPresenter:
+    # Maps the fixed logical canvas onto the window with one scaling step per
+    # frame, and maps window coordinates (mouse) back onto the canvas.
+    def __init__(self, canvas, screen, mode):
+        self.canvas = canvas
+        self.mode = mode
+        self.resize(screen)
+
+    def resize(self, screen):
+        self.screen = screen
+        cw, ch = self.canvas.get_size()
+        sw, sh = screen.get_size()
+        w, h = sw, sh
+        if self.mode == "integer":
+            k = min(sw // cw, sh // ch)
+            if k >= 1:
+                w, h = cw * k, ch * k
+            # Smaller than the canvas: no whole multiple fits, so stretch (nearest)
+        self.dest = pygame.Rect((sw - w) // 2, (sh - h) // 2, w, h)
+        self.scale_x = w / cw
+        self.scale_y = h / ch
+        screen.fill(BLACK)
+        # Scale straight into the window, no intermediate surface
+        self.target = screen if self.dest.size == (sw, sh) else screen.subsurface(self.dest)
+
+    def to_canvas(self, pos):
+        return (int((pos[0] - self.dest.x) / self.scale_x), int((pos[1] - self.dest.y) / self.scale_y))
+
+    def to_window(self, rect):
+        # Grown by a pixel so smooth filtering at the edges is included
+        x = self.dest.x + math.floor(rect.x * self.scale_x) - 1
+        y = self.dest.y + math.floor(rect.y * self.scale_y) - 1
+        w = math.ceil(rect.w * self.scale_x) + 3
+        h = math.ceil(rect.h * self.scale_y) + 3
+        return pygame.Rect(x, y, w, h).clip(self.dest)
+
+    def present(self, rects=None):
+        if self.dest.size == self.canvas.get_size():
+            if rects is None:
+                self.target.blit(self.canvas, (0, 0))
+            else:
+                for r in rects:
+                    self.target.blit(self.canvas, r, r)
+        elif self.mode == "smooth":
+            pygame.transform.smoothscale(self.canvas, self.dest.size, self.target)
+        else:
+            pygame.transform.scale(self.canvas, self.dest.size, self.target)
+
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update([self.to_window(r) for r in rects])
+
+class TextureScreen:
+    # The widget window drawn through a pygame._sdl2.video Renderer. Textures
+    # are made from surfaces on first use and kept, keyed by the surface (or
+    # by key, re-uploaded whenever a different surface is drawn under it).
+    # Stands in for the display surface where only its size is needed.
+    def __init__(self, title, size):
+        from pygame._sdl2 import video
+        self.video = video
+        # Scaling quality is fixed per texture when it is made
+        os.environ.setdefault("SDL_RENDER_SCALE_QUALITY", "1" if SCALE_FILTER == "smooth" else "0")
+        # Surfaces still need a display format to convert() to, so a hidden
+        # 1x1 display window stays around next to the real one
+        if pygame.display.get_surface() is None:
+            pygame.display.set_mode((1, 1), pygame.HIDDEN)
+        self.window = video.Window(title, size, borderless=True)
+        self.renderer = video.Renderer(self.window)
+        self.textures = {}
+
+    def get_size(self):
+        return self.renderer.logical_size if any(self.renderer.logical_size) else self.window.size
+
+    def resize(self, width, height):
+        self.window.size = (width, height)
+        return self
+
+    def texture(self, surface, key=None):
+        key = surface if key is None else key
+        cached = self.textures.get(key)
+        if cached is None or cached[0] is not surface:
+            cached = (surface, self.video.Texture.from_surface(self.renderer, surface))
+            self.textures[key] = cached
+        return cached[1]
+
+    def draw(self, surface, dstrect, flip_x=False, alpha=255, brightness=255, additive=False, key=None):
+        tex = self.texture(surface, key)
+        tex.alpha = alpha
+        tex.color = (brightness, brightness, brightness)
+        tex.blend_mode = 2 if additive else 1 # SDL_BLENDMODE_ADD / _BLEND
+        tex.draw(dstrect=dstrect, flip_x=flip_x)
+
+    def present(self):
+        self.renderer.present()
+
+    def read(self):
+        # The last drawn frame as a surface (slow, for checks and screenshots)
+        return self.renderer.to_surface()
+
+    def close(self):
+        # Textures, then the renderer, then the window they belong to
+        self.textures.clear()
+        self.renderer = None
+        self.window.destroy()
+
+def open_texture_screen(title, size):
+    # A TextureScreen, or None (with the reason printed) if there is no renderer
     try:
-        # Load originals
-        bg_orig = pygame.image.load(os.path.join(asset_dir, 'background.png')).convert()
+        from pygame._sdl2.sdl2 import error as sdl2_error # not a pygame.error
+    except ImportError as e:
+        reason = e
+    else:
+        try:
+            return TextureScreen(title, size)
+        except (pygame.error, sdl2_error) as e:
+            reason = e
+    print(f"Texture renderer unavailable ({reason}), using the surface renderer")
+    return None
+
+class TextureRenderer:
+    # DirtyRenderer's interface for a TextureScreen. The renderer composes a
+    # whole frame each time, so there is no dirty-rect bookkeeping: the
+    # unscaled background is stretched over the window, then every sprite is
+    # drawn with draw_textured(screen) if it has one, else from .image/.rect.
+    def __init__(self, screen, background, present):
+        self.screen = screen
+        self.background = background # the original; rescaled copies are not needed
+        self.present = present
+        self.handle = None # (size, cropped overlay surface)
+        self.fade = None # (previous background, alpha of the current one)
+
+    def invalidate(self, screen=None, background=None):
+        # Resizes only change where things land; textures stay valid. A new
+        # background ends any cross-fade, as in DirtyRenderer
+        if screen is not None:
+            self.screen = screen
+        if background is not None:
+            self.background = background
+            self.fade = None
+
+    def set_fade(self, previous, alpha=255):
+        # Cross-fade: previous underneath, the background at alpha on top
+        self.fade = (previous, alpha) if previous is not None else None
+
+    def _draw(self, sprite):
+        if hasattr(sprite, "draw_textured"):
+            sprite.draw_textured(self.screen)
+        else:
+            self.screen.draw(sprite.image, sprite.rect, key=sprite)
+        if hasattr(sprite, "changed"):
+            sprite.changed = False
+
+    def _overlay(self, overlay_rect, draw_overlay):
+        # draw_overlay paints in window coordinates, so render it once per
+        # size into a transparent layer and keep the overlay_rect part
+        size = self.screen.get_size()
+        if self.handle is None or self.handle[0] != (size, tuple(overlay_rect)):
+            layer = pygame.Surface(size, pygame.SRCALPHA)
+            draw_overlay(layer)
+            self.handle = ((size, tuple(overlay_rect)), layer.subsurface(overlay_rect).copy())
+        return self.handle[1]
+
+    def render(self, sprites, overlay_rect, draw_overlay, groups=(), top=()):
+        screen = self.screen
+        full = (0, 0) + tuple(screen.get_size())
+        if self.fade:
+            screen.draw(self.fade[0], full, key="previous")
+            screen.draw(self.background, full, alpha=self.fade[1], key="background")
+        else:
+            screen.draw(self.background, full, key="background")
+        for s in sprites:
+            self._draw(s)
+        for g in groups:
+            g.draw_textured(screen)
+        screen.draw(self._overlay(overlay_rect, draw_overlay), overlay_rect, key="overlay")
+        for s in top:
+            self._draw(s)
+        self.present()
+
+class DirtyRenderer:
+    # Redraws only the parts of the window that changed since the last present.
+    # Every sprite needs .image, .rect and .draw(surface); the renderer remembers
+    # what it drew last time and restores those regions from the cached background.
+    # Groups (FireflySwarm) report their own changed_rects(limit) instead and
+    # draw(surface, area) only what overlaps area.
+    # present(rects) shows the result; rects=None means the whole frame.
+    def __init__(self, screen, background, present=present_display):
+        self.screen = screen
+        self.background = background
+        self.base = background # the background without any cross-fade
+        self.present = present
+        self.drawn = {} # sprite -> (image, alpha, screen rect) of the last draw
+        self.full_redraw = True
+        self.faded = None # (fade layer, blend surface) while cross-fading
+
+    def invalidate(self, screen=None, background=None):
+        # Resize / expose: the next frame repaints the whole window
+        if screen is not None:
+            self.screen = screen
+        if background is not None:
+            self.background = self.base = background
+            self.faded = None
+        self.full_redraw = True
+
+    def set_fade(self, previous, alpha=255):
+        # Cross-fade: restore from previous with the background at alpha on top
+        # (a full repaint each call), or back to the plain background
+        if previous is None:
+            self.faded = None
+            self.background = self.base
+        else:
+            if self.faded is None or self.faded[1].get_size() != self.base.get_size():
+                # The cached background is shared, so fade a copy of it
+                self.faded = (count_alloc(self.base.copy()), count_alloc(pygame.Surface(self.base.get_size()).convert()))
+            layer, blend = self.faded
+            layer.set_alpha(alpha)
+            blend.blit(previous, (0, 0))
+            blend.blit(layer, (0, 0))
+            self.background = blend
+        self.full_redraw = True
+
+    def _state(self, sprite):
+        # rect size may lag behind the image (Cat only sets rect once), so use the image size
+        area = sprite.image.get_rect(topleft=sprite.rect.topleft)
+        return (sprite.image, sprite.image.get_alpha(), area)
+
+    def _draw(self, sprites, groups, draw_overlay, top, area=None):
+        # Back to front: sprites, groups, the overlay, then sprites drawn on top
+        for s in sprites:
+            if area is None or self.drawn[s][2].colliderect(area):
+                s.draw(self.screen)
+        for g in groups:
+            g.draw(self.screen, area)
+        draw_overlay(self.screen)
+        for s in top:
+            if area is None or self.drawn[s][2].colliderect(area):
+                s.draw(self.screen)
+
+    def _redraw_all(self, sprites, groups, draw_overlay, top):
+        self.full_redraw = False
+        self.drawn = {s: self._state(s) for s in sprites + top}
+        for s in self.drawn:
+            if hasattr(s, "changed"):
+                s.changed = False
+        self.screen.blit(self.background, (0, 0))
+        self._draw(sprites, groups, draw_overlay, top)
+        self.present()
+
+    def render(self, sprites, overlay_rect, draw_overlay, groups=(), top=()):
+        sprites = list(sprites)
+        top = list(top)
+        if self.full_redraw:
+            self._redraw_all(sprites, groups, draw_overlay, top)
+            return
+
+        dirty = []
+        # Sprites that are gone (e.g. a hidden overlay) leave their last rect behind
+        shown = set(sprites).union(top)
+        for s in [s for s in self.drawn if s not in shown]:
+            dirty.append(self.drawn.pop(s)[2])
+
+        for s in sprites + top:
+            # Sprites that track their own changes (Cat) are skipped cheaply
+            if hasattr(s, "changed"):
+                if not s.changed:
+                    continue
+                s.changed = False
+            state = self._state(s)
+            last = self.drawn.get(s)
+            if last is not None and last[0] is state[0] and last[1] == state[1] and last[2] == state[2]:
+                continue
+            self.drawn[s] = state
+            if last is None:
+                dirty.append(state[2])
+            elif last[2].colliderect(state[2]):
+                # Small move: one rect covering both positions
+                dirty.append(last[2].union(state[2]))
+            else:
+                dirty.append(last[2])
+                dirty.append(state[2])
+
+        for g in groups:
+            rects = g.changed_rects(MAX_DIRTY_RECTS - len(dirty))
+            if rects is None:
+                # Too much moving: repaint everything in one pass
+                self._redraw_all(sprites, groups, draw_overlay, top)
+                return
+            dirty.extend(rects)
+
+        if not dirty:
+            return
+
+        # Clip to each region so sprites overlapping its edge are not blended twice
+        for r in dirty:
+            self.screen.set_clip(r)
+            self.screen.blit(self.background, r, r)
+            self._draw(sprites, groups, draw_overlay if overlay_rect.colliderect(r) else (lambda surface: None), top, r)
+        self.screen.set_clip(None)
+
+        self.present(dirty)
+
+class FrameProfiler:
+    # Opt-in instrumentation for the main loop. Phases are timed with add() /
+    # timed(); end_frame() files the frame into a rolling window, counts it as
+    # dropped if its work overran one FPS interval, and streams it to the log.
+    PHASES = ("events", "cat", "fireflies", "blit", "present")
+
+    def __init__(self, log_path=PROFILE_LOG, history=PROFILE_HISTORY):
+        self.enabled = bool(log_path)
+        self.frame_times = deque(maxlen=history) # ms of work per frame
+        self.frame_ends = deque(maxlen=history) # perf_counter at each end_frame
+        self.phase_totals = dict.fromkeys(self.PHASES, 0.0)
+        self.phases = dict.fromkeys(self.PHASES, 0.0)
+        self.frames = 0
+        self.dropped = 0
+        self.allocs = 0 # surfaces allocated / assets rescaled in the last frame
+        self.rescales = 0
+        self.frame_start = time.perf_counter()
+
+        self.log = None
+        if log_path:
+            self.log = open(log_path, "w", buffering=1)
+            self.log_csv = log_path.lower().endswith(".csv")
+            if self.log_csv:
+                self.log.write(",".join(["frame", "time", "total_ms"] + [f"{p}_ms" for p in self.PHASES]
+                                        + ["dropped", "allocs", "rescales"]) + "\n")
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+        self.phases = dict.fromkeys(self.PHASES, 0.0)
+
+    def add(self, phase, seconds):
+        self.phases[phase] += seconds
+
+    def timed(self, phase, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.phases[phase] += time.perf_counter() - start
+        return result
+
+    def end_frame(self, allocs=0, rescales=0):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        total = (now - self.frame_start) * 1000
+        dropped = total > 1000 / FPS
+        self.frames += 1
+        self.dropped += dropped
+        self.allocs = allocs
+        self.rescales = rescales
+        self.frame_times.append(total)
+        self.frame_ends.append(now)
+        for p in self.PHASES:
+            self.phase_totals[p] += self.phases[p]
+
+        if self.log:
+            phases = [round(self.phases[p] * 1000, 4) for p in self.PHASES]
+            if self.log_csv:
+                row = [self.frames, round(time.time(), 3), round(total, 4)] + phases + [int(dropped), allocs, rescales]
+                self.log.write(",".join(map(str, row)) + "\n")
+            else:
+                row = {"frame": self.frames, "time": round(time.time(), 3), "total_ms": round(total, 4)}
+                row.update({f"{p}_ms": v for p, v in zip(self.PHASES, phases)})
+                row.update({"dropped": bool(dropped), "allocs": allocs, "rescales": rescales})
+                self.log.write(json.dumps(row) + "\n")
+
+    def histogram(self):
+        # Frame counts per PROFILE_BINS bucket over the rolling window
+        counts = [0] * (len(PROFILE_BINS) + 1)
+        for ms in self.frame_times:
+            i = 0
+            while i < len(PROFILE_BINS) and ms >= PROFILE_BINS[i]:
+                i += 1
+            counts[i] += 1
+        return counts
+
+    def fps(self):
+        if len(self.frame_ends) < 2:
+            return 0.0
+        return (len(self.frame_ends) - 1) / max(1e-6, self.frame_ends[-1] - self.frame_ends[0])
+
+    def close(self):
+        if self.log:
+            self.log.close()
+            self.log = None
+
+class ProfilerOverlay:
+    # The profiler's numbers as a small panel sprite in the top-left corner.
+    # The panel is re-rendered a few times a second, not every frame.
+    REFRESH_MS = 250
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        pygame.font.init() # only started when the overlay is first shown
+        self.font = pygame.font.Font(None, 16)
+        self.image = pygame.Surface((1, 1), pygame.SRCALPHA)
+        self.rect = pygame.Rect(4, 4, 1, 1)
+        self.refreshed = None
+
+    def update(self):
+        now = ticks_ms()
+        if self.refreshed is not None and now - self.refreshed < self.REFRESH_MS:
+            return
+        self.refreshed = now
+        p = self.profiler
+        times = sorted(p.frame_times) or [0.0]
+        n = max(1, p.frames)
+        lines = [
+            f"{p.fps():5.1f} fps   p50 {times[len(times) // 2]:.2f} ms   max {times[-1]:.2f} ms",
+            f"dropped {p.dropped}/{p.frames}   allocs {p.allocs}   rescales {p.rescales}",
+        ] + [f"{name:10}{p.phase_totals[name] * 1000 / n:7.3f} ms" for name in p.PHASES]
+
+        counts = p.histogram()
+        line_h = self.font.get_linesize()
+        bar_h = 30
+        panel = count_alloc(pygame.Surface((230, line_h * len(lines) + bar_h + 14), pygame.SRCALPHA))
+        panel.fill((0, 0, 0, 170))
+        for i, line in enumerate(lines):
+            panel.blit(count_alloc(self.font.render(line, True, WHITE)), (6, 4 + i * line_h))
+
+        # Frame-time histogram, one bar per bucket (<1 ms ... >=66 ms)
+        top = 8 + line_h * len(lines)
+        most = max(1, max(counts))
+        bar_w = (panel.get_width() - 12) // len(counts)
+        for i, c in enumerate(counts):
+            h = int(bar_h * c / most)
+            color = (120, 200, 120) if i < len(counts) - 3 else (220, 120, 80)
+            panel.fill(color, (6 + i * bar_w, top + bar_h - h, bar_w - 2, h))
+
+        self.image = panel
+        self.rect.size = panel.get_size()
+
+    def draw(self, surface):
+        surface.blit(self.image, self.rect)
+
+class FixedTimestep:
+    # Hands out real (monotonic) time as whole simulation steps; the leftover
+    # fraction is used to interpolate drawing between the last two steps.
+    def __init__(self, dt=SIM_DT, max_catchup=MAX_CATCHUP):
+        self.dt = dt
+        self.max_catchup = max_catchup
+        self.last = time.perf_counter()
+        self.accumulator = 0.0
+
+    def advance(self):
+        now = time.perf_counter()
+        frame_time = now - self.last
+        self.last = now
+        # After a stall (debugger, suspend) don't try to replay all of it
+        if frame_time > self.max_catchup:
+            frame_time = self.max_catchup
+        self.accumulator += frame_time
+        steps = int(self.accumulator / self.dt)
+        self.accumulator -= steps * self.dt
+        return steps, self.accumulator / self.dt
+
+class FrameScheduler:
+    # Sleeps in pygame.event.wait between frames so input wakes the loop at once,
+    # while the frame rate follows what is actually animating.
+    RATES = {"active": ACTIVE_FPS, "ambient": AMBIENT_FPS, "idle": IDLE_FPS}
+
+    def __init__(self):
+        self.rates = dict(self.RATES)
+        self.last_frame = ticks_ms()
+        self.frame_start = self.last_frame
+        self.started = self.last_frame
+        self.frames = 0
+        self.work_ms = 0
+        self.sleep_ms = 0
+
+    def wait(self, mode, next_change_ms=None, wake_on_input=True, hover=None):
+        # Returns all pending events once the next frame is due (or input
+        # arrives, unless wake_on_input is False: then input piles up until
+        # the frame is due, so a burst of mouse motion costs one frame).
+        # Mouse motion alone never ends the wait: hover(event) sees it on
+        # arrival (for the cursor) and it is returned with the rest.
+        now = ticks_ms()
+        self.work_ms += now - self.frame_start
+
+        rate = self.rates[mode]
+        timeout = 1000 / rate if rate else IDLE_MAX_WAIT
+        if next_change_ms is not None:
+            timeout = min(timeout, next_change_ms)
+        deadline = now + int(timeout - (now - self.last_frame))
+
+        events = []
+        if deadline > now and not wake_on_input:
+            pygame.time.wait(deadline - now)
+        elif deadline > now:
+            pending = pygame.event.get()
+            while True:
+                events.extend(pending)
+                if hover:
+                    for event in pending:
+                        if event.type == pygame.MOUSEMOTION:
+                            hover(event)
+                if any(event.type != pygame.MOUSEMOTION for event in pending):
+                    break
+                timeout = deadline - ticks_ms()
+                if timeout <= 0:
+                    break
+                # wait(0) would block forever, so only wait for a positive timeout
+                event = pygame.event.wait(timeout)
+                if event.type == pygame.NOEVENT:
+                    break
+                pending = [event] + pygame.event.get()
+        events.extend(pygame.event.get())
+
+        self.frame_start = ticks_ms()
+        self.sleep_ms += self.frame_start - now
+        self.last_frame = self.frame_start
+        self.frames += 1
+        return events
+
+    def set_max_fps(self, fps):
+        # Caps every mode's rate (the quality governor's lower frame rates)
+        self.rates = {mode: min(rate, fps) if rate else rate for mode, rate in self.RATES.items()}
+
+    def stats(self):
+        total = max(1, ticks_ms() - self.started)
+        return {
+            "fps": self.frames * 1000 / total,
+            "work_ms": self.work_ms,
+            "sleep_ms": self.sleep_ms,
+            "sleep_pct": 100 * self.sleep_ms / total,
+        }
+
+class QualityGovernor:
+    # Measures the work each frame costs and picks a QUALITY_LEVELS entry that
+    # keeps it within budget. end_frame() returns the new quality when the
+    # level changes; stats() reports the level and how much budget is used.
+    def __init__(self, cpu_budget=CPU_BUDGET, frame_budget_ms=FRAME_BUDGET_MS,
+                 window_ms=GOVERNOR_WINDOW_MS):
+        self.cpu_budget = cpu_budget
+        self.frame_budget_ms = frame_budget_ms
+        self.window_ms = window_ms
+        self.level = 0
+        self.changes = 0
+        self.calm_windows = 0
+        self.window_start = time.perf_counter()
+        self.work = [] # seconds of work per frame in the current window
+        # Measurements of the last complete window
+        self.cpu = 0.0
+        self.frame_ms = 0.0
+
+    @property
+    def quality(self):
+        return QUALITY_LEVELS[self.level]
+
+    def budget_use(self):
+        # Above 1.0 means over budget
+        return max(self.cpu / self.cpu_budget, self.frame_ms / self.frame_budget_ms)
+
+    def end_frame(self, work):
+        self.work.append(work)
+        now = time.perf_counter()
+        wall = now - self.window_start
+        if wall * 1000 < self.window_ms:
+            return None
+        self.cpu = sum(self.work) / wall
+        self.frame_ms = float(np.percentile(self.work, 90)) * 1000
+        self.work = []
+        self.window_start = now
+
+        use = self.budget_use()
+        if use > 1.0:
+            self.calm_windows = 0
+            if self.level < len(QUALITY_LEVELS) - 1:
+                return self._set_level(self.level + 1)
+        elif use < GOVERNOR_HEADROOM and self.level > 0:
+            # Hysteresis: only step up after a run of calm windows
+            self.calm_windows += 1
+            if self.calm_windows >= GOVERNOR_CALM_WINDOWS:
+                self.calm_windows = 0
+                return self._set_level(self.level - 1)
+        else:
+            self.calm_windows = 0
+        return None
+
+    def _set_level(self, level):
+        self.level = level
+        self.changes += 1
+        return self.quality
+
+    def stats(self):
+        return {
+            "level": self.level,
+            "levels": len(QUALITY_LEVELS),
+            "quality": self.quality,
+            "changes": self.changes,
+            "cpu": self.cpu,
+            "cpu_budget": self.cpu_budget,
+            "frame_ms": self.frame_ms,
+            "frame_budget_ms": self.frame_budget_ms,
+            "budget_use": self.budget_use(),
+        }
+
+    def describe(self):
+        q = self.quality
+        return (f"quality {self.level}/{len(QUALITY_LEVELS) - 1}: glow {'on' if q['glow'] else 'off'}, "
+                f"{q['fps']} fps, {q['fireflies']:.0%} fireflies, {q['filter']} scaling "
+                f"(cpu {self.cpu:.1%} of {self.cpu_budget:.0%}, "
+                f"p90 frame {self.frame_ms:.2f} of {self.frame_budget_ms:g} ms)")
+
+class WeightedTable:
+    # (weight, value) pairs, sampled by bisecting the cumulative weights
+    def __init__(self, entries):
+        self.values = [value for _, value in entries]
+        self.cumulative = list(accumulate(weight for weight, _ in entries))
+
+    def sample(self, rng):
+        return self.values[bisect(self.cumulative, rng.random() * self.cumulative[-1])]
+
+class TimerQueue:
+    # Min-heap of (due, seq, item). Rescheduling or cancelling an item only
+    # updates its live seq; stale heap entries are dropped when they surface.
+    def __init__(self):
+        self.heap = []
+        self.live = {} # item -> seq of its current entry
+        self.seq = 0
+
+    def __len__(self):
+        return len(self.live)
+
+    def schedule(self, item, due):
+        self.seq += 1
+        self.live[item] = self.seq
+        heapq.heappush(self.heap, (due, self.seq, item))
+
+    def cancel(self, item):
+        self.live.pop(item, None)
+
+    def _drop_stale(self):
+        while self.heap and self.live.get(self.heap[0][2]) != self.heap[0][1]:
+            heapq.heappop(self.heap)
+
+    def next_due(self):
+        self._drop_stale()
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        # Items due at or before now, earliest first
+        due = []
+        self._drop_stale()
+        while self.heap and self.heap[0][0] <= now:
+            _, _, item = heapq.heappop(self.heap)
+            del self.live[item]
+            due.append(item)
+            self._drop_stale()
+        return due
+
+class CatBehaviour:
+    # Drives any number of cats. Idle cats cost nothing per step: each one
+    # waits in the timer queue until its spell ends, and only walking cats
+    # are stepped. All their choices come from rng (a random.Random).
+    def __init__(self, rng):
+        self.rng = rng
+        self.idle_choices = WeightedTable(IDLE_CHOICES)
+        self.settle_poses = WeightedTable(SETTLE_POSES)
+        self.clock = 0.0 # simulated seconds
+        self.timers = TimerQueue()
+        self.walking = set()
+
+    def add(self, cat):
+        cat.behaviour = self
+        cat.settle()
+
+    def step(self, dt):
+        self.clock += dt
+        for cat in self.timers.pop_due(self.clock):
+            cat.on_due()
+        for cat in list(self.walking):
+            cat.update(dt)
+
+    def interpolate(self, t):
+        for cat in self.walking:
+            cat.interpolate(t)
+
+    def is_animating(self):
+        return bool(self.walking)
+
+    def next_change_ms(self):
+        # Time until the next idle cat acts, in ms (None if none is waiting)
+        due = self.timers.next_due()
+        if due is None:
+            return None
+        return max(0, (due - self.clock) * 1000)
+
+class Cat:
+    # One companion. Owned by a CatBehaviour (set by CatBehaviour.add), which
+    # calls on_due() when an idle spell ends and update() while walking.
+    def __init__(self, frames, scene_w, scene_h, x=None, sources=None):
+        self.frames = frames # frames[facing][pose], both facings prebuilt
+        self.sources = sources # unscaled right-facing frames, for draw_textured
+        self.behaviour = None
+        self.current_idx = 1
+        self.facing = FACING_RIGHT
+        self.image = self.frames[self.facing][self.current_idx]
+        self.changed = True # frame, facing or position differs from the last draw
+        self.rect = self.image.get_rect()
         
-        cat_images_orig = []
-        # Load cleaned sprite sheet (already has alpha)
-        sheet = pygame.image.load(os.path.join(asset_dir, 'cat_sprites_clean.png')).convert_alpha()
-        sheet_w = sheet.get_width()
-        sheet_h = sheet.get_height()
-        # Assuming 3 horizontal sprites
-        sprite_w = sheet_w // 3
+        # Position
+        self.scene_w = scene_w # walk targets stay inside the scene
+        self.x = scene_w - 90 if x is None else x
+        self.y = scene_h - 80
+        self.prev_x = self.x
+        self.bob = 0.0 # vertical walk offset
+        self.prev_bob = 0.0
+        self.walk_time = 0.0
+        self.rect.topleft = (int(self.x), int(self.y))
         
-        for i in range(3):
-            # Create surface for each sprite (needs SRCALPHA to keep transparency)
-            surf = pygame.Surface((sprite_w, sheet_h), pygame.SRCALPHA)
-            surf.blit(sheet, (0, 0), (i * sprite_w, 0, sprite_w, sheet_h))
-            cat_images_orig.append(surf)
+        # Movement / State
+        self.state = "idle" # idle, walk
+        self.target_x = self.x
+        self.speed = CAT_SPEED # A bit faster to match bobbing
+
+    def update_pos(self, w, h):
+        # Keep relative scale or just clamp?
+        # Let's just ensure it remains on screen
+        self.scene_w = w
+        self.y = h - 70
+        self.x = min(self.x, w - 60)
+        self.prev_x = self.x
+        self.rect.topleft = (int(self.x), int(self.y))
+        self.changed = True
+
+    def update_images(self, new_frames):
+        self.frames = new_frames
+        self.image = self.frames[self.facing][self.current_idx]
+        self.changed = True
+
+    def _set_pose(self, idx):
+        self.current_idx = idx
+        # Face left only while walking left (mirrored frames are prebuilt)
+        self.facing = FACING_LEFT if self.state == "walk" and self.target_x < self.x else FACING_RIGHT
+        image = self.frames[self.facing][self.current_idx]
+        if image is not self.image:
+            self.image = image
+            self.changed = True
+
+    def _idle_for(self):
+        # Keep the long duration consistent!
+        behaviour = self.behaviour
+        behaviour.timers.schedule(self, behaviour.clock + behaviour.rng.uniform(IDLE_MIN, IDLE_MAX))
+
+    def settle(self):
+        # Stop and switch to a preferred pose (lick or sleep) immediately
+        self.state = "idle"
+        self.behaviour.walking.discard(self)
+        self._set_pose(self.behaviour.settle_poses.sample(self.behaviour.rng))
+        self._idle_for()
+
+    def on_due(self):
+        # The idle spell is over: walk somewhere or change pose
+        rng = self.behaviour.rng
+        choice = self.behaviour.idle_choices.sample(rng)
+        if choice == WALK:
+            self.walk_to(rng.randint(0, self.scene_w - 60))
+        else:
+            self._set_pose(choice)
+            self._idle_for()
+
+    def walk_to(self, x):
+        self.state = "walk"
+        self.target_x = x
+        self.behaviour.timers.cancel(self)
+        self.behaviour.walking.add(self)
+        # Switch to walking pose (using idx 1 'licking' as makeshift walk cycle or just sit)
+        # Ideally we'd have a walk anim, but we'll hop/slide with pose 0
+        self._set_pose(0)
+
+    def update(self, dt):
+        # One fixed walking step of dt seconds
+        self.prev_x = self.x
+        self.prev_bob = self.bob
 
-        # Removed individual loads
+        # Move towards target
+        dx = self.target_x - self.x
+        step = self.speed * dt
+        if abs(dx) < step:
+            self.x = self.target_x
+            self.prev_x = self.x
+            self.bob = 0.0 # Reset height
+            self.prev_bob = 0.0
+            self.settle()
+            # Idle cats are not interpolated, so place it for good now
+            self.interpolate(0.0)
+        else:
+            self.x += step if dx > 0 else -step
             
-        firefly_orig = pygame.image.load(os.path.join(asset_dir, 'firefly.png')).convert()
-        firefly_orig.set_colorkey(firefly_orig.get_at((0,0))) 
-        firefly_img = pygame.transform.scale(firefly_orig, (10, 10))
+            # Bobbing motion (Walk cycle simulation)
+            # Bob up and down every 10 pixels or so
+            self.walk_time += dt
+            self.bob = math.sin(self.walk_time * CAT_BOB_RATE) * 3
+            self._set_pose(0)
+
+    def interpolate(self, t):
+        # Draw position between the previous and current step
+        x = self.prev_x + (self.x - self.prev_x) * t
+        bob = self.prev_bob + (self.bob - self.prev_bob) * t
+        pos = (int(x), int(self.y + bob))
+        if pos != self.rect.topleft:
+            self.rect.topleft = pos
+            self.changed = True
+
+    def draw(self, surface):
+        surface.blit(self.image, self.rect)
+
+    def draw_textured(self, screen):
+        # Scaled and mirrored by the renderer, from the unscaled frame
+        screen.draw(self.sources[self.current_idx], (self.rect.topleft, self.image.get_size()),
+                    flip_x=self.facing == FACING_LEFT)
+
+def default_asset_dir():
+    if getattr(sys, 'frozen', False):
+        return os.path.join(sys._MEIPASS, 'assets')
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+
+def load_image(path):
+    # The precompiled blob next to path if it is up to date, else the image itself
+    blob = os.path.splitext(path)[0] + BLOB_EXT
+    try:
+        if os.path.getmtime(blob) >= os.path.getmtime(path):
+            with open(blob, 'rb') as f:
+                data = f.read()
+            magic, w, h = BLOB_HEADER.unpack_from(data)
+            # A short (half-written) blob is ignored like a stale one
+            if magic == BLOB_MAGIC and len(data) - BLOB_HEADER.size == w * h * 4:
+                return pygame.image.frombuffer(data[BLOB_HEADER.size:], (w, h), "BGRA")
+    except (OSError, struct.error):
+        pass
+    return pygame.image.load(path)
+
+class AssetLoader:
+    # Decodes the widget's images on a thread pool (pygame drops the GIL while
+    # decoding), starting before the window is open. get(name) waits for one;
+    # nothing is converted here, that needs the display.
+    def __init__(self, asset_dir, workers=LOAD_WORKERS):
+        self.asset_dir = asset_dir
+        self.manifest = None
+        files = {'background': 'background.png', 'firefly': 'firefly.png'}
+        atlas_path = os.path.join(asset_dir, 'cat_atlas.json')
+        if os.path.exists(atlas_path):
+            with open(atlas_path) as f:
+                self.manifest = json.load(f)
+            files['cats'] = self.manifest['image']
+        else:
+            files['cats'] = 'cat_sprites_clean.png'
+
+        pool = ThreadPoolExecutor(workers)
+        self.jobs = {name: pool.submit(load_image, os.path.join(asset_dir, file))
+                     for name, file in files.items()}
+        pool.shutdown(wait=False)
+
+    def get(self, name):
+        # Raises FileNotFoundError if the asset is missing
+        return self.jobs[name].result()
+
+class StartupTimer:
+    # Milestones since construction, for the startup breakdown
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.marks = []
+
+    def mark(self, label):
+        now = time.perf_counter()
+        self.marks.append((label, (now - self.last) * 1000))
+        self.last = now
+
+    def since_start_ms(self):
+        return (self.last - self.start) * 1000
+
+    def report(self, first_frame_ms):
+        parts = ", ".join(f"{label} {ms:.1f} ms" for label, ms in self.marks)
+        verdict = "within" if first_frame_ms <= STARTUP_BUDGET_MS else "OVER"
+        return (f"Startup: {parts} (first frame at {first_frame_ms:.1f} ms, "
+                f"{verdict} the {STARTUP_BUDGET_MS} ms budget)")
+
+def keyed_firefly(img):
+    # The firefly JPEG, with its corner colour as the (approximate) key
+    img = img.convert()
+    img.set_colorkey(img.get_at((0,0)))
+    return img
+
+def widget_log_path(path, index, count):
+    # path for widget index of count: profile.csv, or profile-1.csv,
+    # profile-2.csv... so several widgets don't write over each other
+    if not path or count <= 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{index + 1}{ext}"
+
+class CozyScene:
+    # Everything inside the widget window - assets, cat, fireflies and how they
+    # are drawn - but not the window itself, so it also runs headless
+    # (benchmark.py). Raises FileNotFoundError if an asset is missing.
+    # Pass a loader (and the cache it was drawn from) to reuse work done
+    # during startup. hour starts the day/night lighting at that hour of the
+    # day; None leaves the background as it is. profile_log is the frame log
+    # path, if any (each scene needs its own).
+    def __init__(self, screen, asset_dir=None, firefly_count=FIREFLY_COUNT,
+                 present_mode=PRESENT_MODE, seed=None, companions=COMPANIONS,
+                 loader=None, asset_cache=None, hour=None, profile_log=PROFILE_LOG):
+        # One seed per session, split into a stream per subsystem, so the same
+        # seed (and inputs) replays identically
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        cat_seed, firefly_seed = np.random.SeedSequence(self.seed).spawn(2)
+        self.clock = ticks_ms # ms; replays substitute the recorded time
+        self.screen = screen
+        self.asset_cache = asset_cache or AssetCache()
+        self._load_assets(loader or AssetLoader(asset_dir or default_asset_dir()))
+        self.lighting = DayLighting(hour) if hour is not None else None
+        self.light_step = self.lighting.step_at(0) if self.lighting else None
+        self.light_fade = None # (previous backdrop, ticks it started) while cross-fading
+        self.hour = hour
+
+        # The scene is drawn at the window size, or at LOGICAL_SIZE and scaled on present
+        self.textured = isinstance(screen, TextureScreen)
+        if self.textured:
+            # The renderer draws straight to the window and scales on its own
+            if present_mode:
+                screen.renderer.logical_size = LOGICAL_SIZE
+            self.w, self.h = screen.get_size()
+            self.canvas = screen
+            self.presenter = None
+        elif present_mode:
+            self.w, self.h = LOGICAL_SIZE
+            self.canvas = pygame.Surface(LOGICAL_SIZE).convert()
+            self.presenter = CanvasPresenter(self.canvas, screen, present_mode)
+        else:
+            self.w, self.h = screen.get_size()
+            self.canvas = screen
+            self.presenter = None
+
+        self.bg_img, self.cat_frames = self.scale_assets(self.w, self.h)
+        self.behaviour = CatBehaviour(random.Random(int(cat_seed.generate_state(1)[0])))
+        self.cat_sources = [self.crop_to_content(f"cat{i}", img) for i, img in enumerate(self.cat_images_orig)]
+        self.cats = [Cat(self.cat_frames, self.w, self.h, sources=self.cat_sources)]
+        for _ in range(companions - 1):
+            self.cats.append(Cat(self.cat_frames, self.w, self.h, self.behaviour.rng.uniform(0, self.w - 60),
+                                 self.cat_sources))
+        for cat in self.cats:
+            self.behaviour.add(cat)
+        self.cat = self.cats[0]
+        self.firefly_count = firefly_count
+        self.scale_filter = SCALE_FILTER # lowered by set_quality
+        self.fireflies = FireflySwarm(self.firefly_bank, firefly_count, self.w, self.h,
+                                      np.random.default_rng(firefly_seed))
+        if self.lighting:
+            self.fireflies.brightness = self.lighting.firefly_brightness(self.light_step)
+        if self.textured:
+            self.renderer = TextureRenderer(self.canvas, self.backdrop(), self._present)
+        else:
+            self.renderer = DirtyRenderer(self.canvas, self.backdrop(), self._present)
+        self.rescale_due = None # ticks when the final-quality rescale is due after a resize
+        self.profiler = FrameProfiler(profile_log)
+        self.overlay = None # ProfilerOverlay while it is shown
+
+    def _load_assets(self, loader):
+        # Decoded originals, converted to the display format once per cache
+        originals = self.asset_cache
+        self.bg_orig = originals.original('background', lambda: loader.get('background').convert(), self)
+        self.originals = [self.bg_orig]
         
-    except FileNotFoundError as e:
-        print(f"Error loading assets: {e}")
-        return
+        self.cat_images_orig = []
+        self.cat_mirrored_orig = [] # pre-mirrored frames, only from the atlas
+        manifest = loader.manifest
+        if manifest:
+            # Precompiled atlas (build_atlas.py): frames are already keyed and
+            # tightly cropped, so they are just views into the one atlas image
+            atlas = originals.original('cats', lambda: loader.get('cats').convert_alpha(), self)
+            self.originals.append(atlas)
+            for i, name in enumerate(manifest['order']):
+                frame = atlas.subsurface(manifest['frames'][name]['rect'])
+                self.cat_images_orig.append(frame)
+                self.cat_mirrored_orig.append(atlas.subsurface(manifest['frames'][name + '_flip']['rect']))
+                # Atlas frames need no mask pass
+                self.asset_cache.crop_boxes[f"cat{i}"] = frame.get_rect()
+        else:
+            # Load cleaned sprite sheet (already has alpha)
+            sheet = originals.original('cats', lambda: loader.get('cats').convert_alpha(), self)
+            self.originals.append(sheet)
+            sheet_w = sheet.get_width()
+            sheet_h = sheet.get_height()
+            # Assuming 3 horizontal sprites
+            sprite_w = sheet_w // 3
+            
+            for i in range(3):
+                # Views into the sheet, like the atlas frames
+                self.cat_images_orig.append(sheet.subsurface((i * sprite_w, 0, sprite_w, sheet_h)))
+            
+        self.originals.append(originals.original('firefly', lambda: keyed_firefly(loader.get('firefly')), self))
+        # Each scene keeps its own (small) bank: its glow follows its own quality level
+        self.firefly_bank = FireflySpriteBank(self.originals[-1])
+        print(f"Firefly sprite bank: {len(self.firefly_bank.images) + len(self.firefly_bank.glows)} images, "
+              f"{self.firefly_bank.memory_bytes() / 1024:.1f} KB")
 
-    def crop_to_content(surf):
-        mask = pygame.mask.from_surface(surf)
-        rects = mask.get_bounding_rects()
-        if rects:
-            # Union all rects to get the full bounding box
-            r = rects[0].unionall(rects)
-            return surf.subsurface(r).copy()
-        return surf
+    def crop_to_content(self, name, surf):
+        # Subsurface, no copy: it is only ever scaled from
+        return surf.subsurface(self.asset_cache.crop_box(name, surf))
 
-    # Rescale assets
-    def scale_assets(w, h):
-        bg = pygame.transform.scale(bg_orig, (w, h))
-        cats = []
-        for img in cat_images_orig:
+    # Rescale assets (cached per size and filter); cats[facing][pose]. What
+    # this returns is what the scene uses from now on, so it is what it holds.
+    # The background comes back lit for the current lighting step.
+    def scale_assets(self, w, h, filter=SCALE_FILTER):
+        if self.textured:
+            # The renderer stretches the original itself (lit at its own size)
+            self.bg_key = ("background",)
+            self.bg_scaled = self.bg_orig
+        else:
+            self.bg_key = ("background", (w, h), filter)
+            self.bg_scaled = self.asset_cache.scaled("background", self.bg_orig, (w, h), filter, self)
+        bg = self.light()
+        cats = ([], [])
+        for i, img in enumerate(self.cat_images_orig):
             # Crop first (remove empty space from spritesheet slice)
-            cropped = crop_to_content(img)
+            name = f"cat{i}"
+            cropped = self.crop_to_content(name, img)
             
             # Constant Height Scaling (maintain aspect ratio)
-            target_h = 70
             aspect = cropped.get_width() / cropped.get_height()
-            target_w = int(target_h * aspect)
+            target_w = int(CAT_HEIGHT * aspect)
             
-            cats.append(pygame.transform.scale(cropped, (target_w, target_h)))
+            right = self.asset_cache.scaled(name, cropped, (target_w, CAT_HEIGHT), filter, self)
+            if self.cat_mirrored_orig:
+                flipped = self.cat_mirrored_orig[i]
+                left = self.asset_cache.scaled(name + "_flip", flipped, (target_w, CAT_HEIGHT), filter, self)
+            else:
+                left = self.asset_cache.mirrored(name, right, filter, self)
+            cats[FACING_RIGHT].append(right)
+            cats[FACING_LEFT].append(left)
+        self._hold(bg, cats)
         return bg, cats
 
-    bg_img, cat_images = scale_assets(current_w, current_h)
-
-    # Cat Class
-    class Cat:
-        def __init__(self, images):
-            self.images = images
-            self.images = images
-            # Start with a preferred pose (1=lick, 2=sleep), avoid 0 (sit)
-            self.current_idx = random.choice([1, 2])
-            self.image = self.images[self.current_idx]
-            self.rect = self.image.get_rect()
-            
-            # Position
-            self.x = current_w - 90
-            self.y = current_h - 80
-            self.rect.topleft = (int(self.x), int(self.y))
-            
-            # Movement / State
-            self.state = "idle" # idle, walk
-            self.target_x = self.x
-            self.timer = 0
-            # 15-35 minutes idle (at 60 FPS)
-            # 15 * 60 * 60 = 54000
-            # 35 * 60 * 60 = 126000
-            self.duration = random.randint(54000, 126000) 
-            self.speed = 1.6 # A bit faster to match bobbing
-
-        def update_pos(self, w, h):
-            # Keep relative scale or just clamp?
-            # Let's just ensure it remains on screen
-            self.y = h - 70
-            self.x = min(self.x, w - 60)
-            self.rect.topleft = (int(self.x), int(self.y))
-
-        def update_images(self, new_images):
-            self.images = new_images
-            self.image = self.images[self.current_idx]
-
-        def update(self):
-            # State Management
-            self.timer += 1
-            
-            if self.state == "idle":
-                # Switch pose occasionally
-                if self.timer >= self.duration:
-                    self.timer = 0
-                    # Keep the long duration consistent!
-                    self.duration = random.randint(54000, 126000)
-                    
-                    # 50% chance to start walking, 50% chance to change idle pose
-                    if random.random() < 0.5:
-                        self.state = "walk"
-                        self.target_x = random.randint(0, WINDOW_WIDTH - 60)
-                        # Switch to walking pose (using idx 1 'licking' as makeshift walk cycle or just sit)
-                        # Ideally we'd have a walk anim, but we'll hop/slide with pose 0
-                        self.current_idx = 0 
-                    else:
-                        # Change idle pose
-                        # 0 = sit (hate), 1 = lick (love), 2 = sleep (love)
-                        # Weights: Sit EXTREMELY low (User hates it), Lick/Sleep high
-                        # 1 instance of '0', 25 instances of '1' and '2'
-                        pool = [0] + [1]*25 + [2]*25
-                        choice = random.choice(pool)
-                        self.current_idx = choice
-            
-            elif self.state == "walk":
-                # Move towards target
-                dx = self.target_x - self.x
-                if abs(dx) < self.speed:
-                    self.x = self.target_x
-                    self.state = "idle"
-                    self.timer = 0
-                    # Switch to preferred pose (1=lick, 2=sleep) immediately!
-                    self.current_idx = random.choice([1, 2])
-                    self.rect.y = int(self.y) # Reset height
-                else:
-                    self.x += self.speed if dx > 0 else -self.speed
-                    
-                    # Bobbing motion (Walk cycle simulation)
-                    # Bob up and down every 10 pixels or so
-                    bob_offset = math.sin(pygame.time.get_ticks() * 0.015) * 3
-                    self.rect.y = int(self.y + bob_offset)
-                    
-                    # Switch sprites for rudimentary animation if we had them, 
-                    # for now sticking to the 'sit' or 'lick' pose but purely the bobbing helps "floatiness"
-                    self.current_idx = 0 
-            
-            # Update Image and Rect x (y is handled in walk or idle)
-            self.image = self.images[self.current_idx]
-            self.rect.x = int(self.x)
-            if self.state == "idle":
-                 self.rect.y = int(self.y)
-            
-            # Flip if moving left
-            if self.state == "walk" and self.target_x < self.x:
-                 self.image = pygame.transform.flip(self.image, True, False)
+    def _hold(self, bg, cats):
+        self.asset_cache.hold(self, self.originals + [self.bg_scaled, bg] + cats[FACING_RIGHT] + cats[FACING_LEFT])
 
-        def draw(self, surface):
-            surface.blit(self.image, self.rect)
+    def light(self):
+        # The background as lit at the current lighting step
+        if not self.lighting:
+            return self.bg_scaled
+        return self.asset_cache.tinted(self.bg_key, self.bg_scaled, self.light_step,
+                                       self.lighting.lut(self.light_step), self)
 
-    fireflies = [Firefly(firefly_img) for _ in range(FIREFLY_COUNT)]
-    cat = Cat(cat_images)
+    def backdrop(self):
+        # What the renderer draws everything over: the lit background, scaled
+        # to the window unless the renderer does that
+        return self.bg_img
 
-    # Interactive state
-    dragging = False
-    resizing = False
-    drag_start_pos = (0, 0) # Mouse pos relative to screen
-    window_start_pos = (0, 0) # Window pos
-    
-    # To track window position without relying on unreliable pygame get_window_position
-    # We will use WinAPI to get rect
-    rect = ctypes.wintypes.RECT()
-    
-    running = True
-    while running:
-        # Event Handling
-        events = pygame.event.get()
+    def update_lighting(self):
+        # New tint only at step boundaries, then a cross-fade to it
+        now = self.clock()
+        step = self.lighting.step_at(now)
+        if step != self.light_step:
+            previous = self.backdrop()
+            self.light_step = step
+            self.bg_img = self.light()
+            self._hold(self.bg_img, self.cat_frames)
+            self.renderer.invalidate(background=self.backdrop())
+            self.fireflies.brightness = self.lighting.firefly_brightness(step)
+            self.fireflies.changed = True
+            self.light_fade = (previous, now)
+        if self.light_fade:
+            previous, start = self.light_fade
+            alpha = (now - start) * 255 // LIGHTING_FADE_MS
+            if alpha >= 255:
+                self.light_fade = None
+                self.renderer.set_fade(None)
+            else:
+                self.renderer.set_fade(previous, alpha)
+
+    def close(self):
+        # Let go of the shared assets; the scene is not drawn again
+        self.asset_cache.release(self)
+
+    def set_quality(self, quality):
+        # Apply a QUALITY_LEVELS entry (the frame rate is the scheduler's)
+        self.fireflies.set_active(round(self.firefly_count * quality["fireflies"]))
+        if self.firefly_bank.set_glow(quality["glow"]):
+            self.fireflies.set_bank(self.firefly_bank)
+        self.fireflies.interpolate(0.0)
+        if quality["filter"] != self.scale_filter:
+            self.scale_filter = quality["filter"]
+            if not self.presenter and not self.textured:
+                self.bg_img, self.cat_frames = self.scale_assets(self.w, self.h, self.scale_filter)
+                for cat in self.cats:
+                    cat.update_images(self.cat_frames)
+        # Fireflies that stopped (or lost their glow) may not be in the
+        # swarm's last dirty rects, so repaint everything once
+        self.renderer.invalidate(background=self.backdrop())
+
+    def _present(self, rects=None):
+        start = time.perf_counter()
+        if self.textured:
+            self.canvas.present()
+        elif self.presenter:
+            self.presenter.present(rects)
+        else:
+            present_display(rects)
+        self.profiler.add("present", time.perf_counter() - start)
+
+    def toggle_overlay(self):
+        # Showing the overlay also switches the profiler on
+        if self.overlay:
+            self.overlay = None
+            self.profiler.enabled = bool(self.profiler.log)
+        else:
+            self.profiler.enabled = True
+            self.overlay = ProfilerOverlay(self.profiler)
+
+    def to_scene(self, pos):
+        return self.presenter.to_canvas(pos) if self.presenter else pos
+
+    def in_grip(self, pos):
+        # Resize grip: bottom right 20x20 of the scene
+        mx, my = self.to_scene(pos)
+        return mx > self.w - 20 and my > self.h - 20
+
+    def is_animating(self):
+        # Needs full frame rate (fireflies alone only need the ambient rate)
+        return self.behaviour.is_animating() or self.rescale_due is not None or self.light_fade is not None
+
+    def next_change_ms(self):
+        change = self.behaviour.next_change_ms()
+        if self.lighting:
+            step = self.lighting.ms_to_next_step(self.clock())
+            change = step if change is None else min(change, step)
+        return change
+
+    def invalidate(self):
+        self.renderer.invalidate()
+
+    def resize(self, screen):
+        # The window was re-created at a new size
+        self.screen = screen
+        if self.presenter:
+            # Only the present transform changes
+            self.presenter.resize(screen)
+            self.renderer.invalidate()
+            return
+
+        self.w, self.h = screen.get_size()
+        self.canvas = screen
+        self.light_fade = None # the new size repaints everything anyway
+        if not self.textured:
+            # Cheap rescale while dragging, full quality once the size settles
+            # (textures are scaled by the renderer, so only positions change)
+            self.bg_img, self.cat_frames = self.scale_assets(self.w, self.h, PREVIEW_FILTER)
+            self.rescale_due = self.clock() + RESIZE_DEBOUNCE_MS
+        for cat in self.cats:
+            cat.update_images(self.cat_frames)
+            cat.update_pos(self.w, self.h)
+        self.renderer.invalidate(screen, self.backdrop())
+        
+        # Update fireflies bounds (they might go out of bounds, let's pull them in)
+        self.fireflies.set_bounds(self.w, self.h)
+
+    def finish_resize(self):
+        # Resize grip released: full-quality rescale right away
+        if self.rescale_due is not None:
+            self.rescale_due = self.clock()
+
+    def update(self, steps, t):
+        # steps fixed sim steps, then interpolate drawing t of the way to the next
+        if self.rescale_due is not None and self.clock() >= self.rescale_due:
+            self.rescale_due = None
+            self.bg_img, self.cat_frames = self.scale_assets(self.w, self.h, self.scale_filter)
+            for cat in self.cats:
+                cat.update_images(self.cat_frames)
+            self.renderer.invalidate(background=self.backdrop())
+        if self.lighting:
+            self.update_lighting()
+
+        start = time.perf_counter()
+        for _ in range(steps):
+            self.behaviour.step(SIM_DT)
+        self.behaviour.interpolate(t)
+        mid = time.perf_counter()
+        for _ in range(steps):
+            self.fireflies.update(SIM_DT)
+        if steps:
+            self.fireflies.interpolate(t)
+        self.profiler.add("cat", mid - start)
+        self.profiler.add("fireflies", time.perf_counter() - mid)
+
+    # Draw subtle resize handle
+    def draw_handle(self, surface):
+        w, h = self.w, self.h
+        pygame.draw.line(surface, (200, 200, 200), (w-10, h-2), (w-2, h-10), 1)
+        pygame.draw.line(surface, (200, 200, 200), (w-6, h-2), (w-2, h-6), 1)
+
+    def render(self):
+        # Draw (only what changed; full repaint after resize)
+        handle_rect = pygame.Rect(self.w - 10, self.h - 10, 10, 10)
+        top = ()
+        if self.overlay:
+            self.overlay.update()
+            top = (self.overlay,)
+        start = time.perf_counter()
+        present_before = self.profiler.phases["present"]
+        self.renderer.render(self.cats, handle_rect, self.draw_handle, [self.fireflies], top)
+        # Everything but presenting counts as blitting
+        presented = self.profiler.phases["present"] - present_before
+        self.profiler.add("blit", time.perf_counter() - start - presented)
+
+from ctypes import byref, Structure, c_long
+if sys.platform == "win32":
+    from ctypes import windll, wintypes
+
+class POINT(Structure):
+    _fields_ = [("x", c_long), ("y", c_long)]
+
+class WindowBackend:
+    # The window-system calls the widget makes: cursor position in screen
+    # coordinates, window rect (x, y, w, h), moving the window and re-creating
+    # it at a new size (returns the new screen surface), and the cursor shape.
+    # Every call is counted; observer(name, result), if set, sees each read.
+    def __init__(self):
+        self.calls = Counter()
+        self.observer = None
+        self.texture_screen = None # set when the window is a TextureScreen
+
+    def cursor_pos(self):
+        self.calls["cursor_pos"] += 1
+        pos = self._cursor_pos()
+        if self.observer:
+            self.observer("cursor_pos", pos)
+        return pos
+
+    def window_rect(self):
+        self.calls["window_rect"] += 1
+        rect = self._window_rect()
+        if self.observer:
+            self.observer("window_rect", rect)
+        return rect
+
+    def move(self, x, y, width, height):
+        self.calls["move"] += 1
+        self._move(x, y, width, height)
+
+    def resize(self, width, height):
+        self.calls["resize"] += 1
+        if self.texture_screen is not None:
+            # Resized in place; the renderer follows the window
+            return self.texture_screen.resize(width, height)
+        return self._resize(width, height)
+
+    def set_cursor(self, grip):
+        # Resize arrows over the grip, the normal arrow elsewhere
+        self.calls["set_cursor"] += 1
+        self._set_cursor(grip)
+
+class Win32Backend(WindowBackend):
+    def __init__(self, hwnd):
+        super().__init__()
+        self.hwnd = hwnd
+
+    def _cursor_pos(self):
+        pt = POINT()
+        windll.user32.GetCursorPos(byref(pt))
+        return (pt.x, pt.y)
+
+    def _window_rect(self):
+        # pygame's get_window_position is unreliable for frameless windows
+        rect = wintypes.RECT()
+        windll.user32.GetWindowRect(self.hwnd, byref(rect))
+        return (rect.left, rect.top, rect.right - rect.left, rect.bottom - rect.top)
+
+    def _move(self, x, y, width, height):
+        # SWP_NOZORDER (0x0004) | SWP_NOACTIVATE (0x0010)
+        windll.user32.SetWindowPos(self.hwnd, 0, x, y, width, height, 0x0014)
+
+    def _resize(self, width, height):
+        return pygame.display.set_mode((width, height), pygame.NOFRAME)
+
+    def _set_cursor(self, grip):
+        pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_SIZENWSE if grip else pygame.SYSTEM_CURSOR_ARROW)
+
+class RecordingBackend(WindowBackend):
+    # Stand-in without a window system: set .cursor to script the mouse; moves
+    # and resizes only update .rect and are logged in .log. Runs headless.
+    # With display=True resizes still re-create the pygame display, so the
+    # widget runs (without window moves) where there is no Win32 API.
+    def __init__(self, rect=(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT), display=False):
+        super().__init__()
+        self.rect = tuple(rect)
+        self.display = display
+        self.cursor = (0, 0)
+        self.log = []
+
+    def _cursor_pos(self):
+        return self.cursor
+
+    def _window_rect(self):
+        return self.rect
+
+    def _move(self, x, y, width, height):
+        self.rect = (x, y, width, height)
+        self.log.append(("move", self.rect))
+
+    def _resize(self, width, height):
+        self.rect = self.rect[:2] + (width, height)
+        self.log.append(("resize", (width, height)))
+        if self.display:
+            return pygame.display.set_mode((width, height), pygame.NOFRAME)
+        return pygame.Surface((width, height))
+
+    def _set_cursor(self, grip):
+        self.log.append(("set_cursor", grip))
+        if self.display:
+            try:
+                pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_SIZENWSE if grip else pygame.SYSTEM_CURSOR_ARROW)
+            except pygame.error:
+                pass # no cursors without a real video driver
+
+class ReplayBackend(RecordingBackend):
+    # Answers cursor and window rect reads from a recorded frame, in order
+    def __init__(self, rect):
+        super().__init__(rect, display=True)
+        self.cursors = deque()
+        self.rects = deque()
+
+    def feed(self, cursors, rects):
+        self.cursors.extend(cursors)
+        self.rects.extend(rects)
+
+    def _cursor_pos(self):
+        return self.cursors.popleft()
+
+    def _window_rect(self):
+        return self.rects.popleft()
+
+class WindowInteraction:
+    # Dragging the frameless window and resizing it from the grip, driven by
+    # mouse events. Motion only marks the gesture pending; flush() - called
+    # once per frame - reads the cursor once and makes at most one move or
+    # resize, and none if the result is what was last applied.
+    MIN_SIZE = 100
+
+    def __init__(self, backend, size):
+        self.backend = backend
+        self.size = size
+        self.mode = None # "drag" or "resize" while the button is held
+        self.pending = False
+        self.start_cursor = (0, 0)
+        self.start = (0, 0) # window position (drag) or size (resize) at press
+        self.applied = None
+
+    @property
+    def active(self):
+        return self.mode is not None
+
+    def press(self, resize):
+        self.mode = "resize" if resize else "drag"
+        self.start_cursor = self.backend.cursor_pos()
+        self.start = self.size if resize else self.backend.window_rect()[:2]
+        self.applied = self.start
+        self.pending = False
+
+    def motion(self):
+        if self.mode:
+            self.pending = True
+
+    def release(self):
+        # Ends the gesture; returns which one it was
+        mode = self.mode
+        self.mode = None
+        self.pending = False
+        return mode
+
+    def flush(self):
+        # Applies pending motion; returns the new screen after a resize, else None
+        if not self.pending:
+            return None
+        self.pending = False
+        x, y = self.backend.cursor_pos()
+        dx = x - self.start_cursor[0]
+        dy = y - self.start_cursor[1]
+        if self.mode == "drag":
+            pos = (self.start[0] + dx, self.start[1] + dy)
+            if pos != self.applied:
+                self.applied = pos
+                self.backend.move(pos[0], pos[1], *self.size)
+            return None
+
+        size = (max(self.MIN_SIZE, self.start[0] + dx), max(self.MIN_SIZE, self.start[1] + dy))
+        if size == self.applied:
+            return None
+        self.applied = self.size = size
+        return self.backend.resize(*size)
+
+class SessionRecorder:
+    # Writes the session log described at REPLAY_HEADER. Set
+    # observe as the window backend's observer to capture its reads.
+    def __init__(self, path, scene, size):
+        self.file = gzip.open(path, "wb")
+        self.file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, scene.seed, size[0], size[1],
+                                           scene.firefly_count, len(scene.cats),
+                                           math.nan if scene.hour is None else scene.hour))
+        self.cursors = []
+        self.rects = []
+        self.frames = 0
+
+    def observe(self, name, value):
+        (self.cursors if name == "cursor_pos" else self.rects).append(value)
+
+    def frame(self, ticks, steps, t, level, size, events, screen):
+        events = [e for e in events if e.type in REPLAY_EVENTS]
+        parts = [REPLAY_FRAME.pack(ticks, steps, t, level, size[0], size[1], frame_crc(screen),
+                                   len(self.cursors), len(self.rects), len(events))]
+        parts += [REPLAY_POINT.pack(*p) for p in self.cursors]
+        parts += [REPLAY_RECT.pack(*r) for r in self.rects]
+        for e in events:
+            x, y = getattr(e, "pos", (0, 0))
+            parts.append(REPLAY_EVENT.pack(REPLAY_EVENTS.index(e.type), x, y,
+                                           getattr(e, "button", getattr(e, "key", 0))))
+        self.file.write(b"".join(parts))
+        self.cursors = []
+        self.rects = []
+        self.frames += 1
+
+    def close(self):
+        self.file.close()
+
+def frame_crc(surface):
+    return zlib.crc32(surface.get_buffer())
+
+def read_session(path):
+    # (header dict, generator of per-frame dicts) from a SessionRecorder log
+    f = gzip.open(path, "rb")
+    magic, seed, w, h, fireflies, companions, hour = REPLAY_HEADER.unpack(f.read(REPLAY_HEADER.size))
+    if magic != REPLAY_MAGIC:
+        raise ValueError(f"{path} is not a session log (or from an older version)")
+    header = {"seed": seed, "size": (w, h), "fireflies": fireflies, "companions": companions,
+              "hour": None if math.isnan(hour) else hour}
+
+    def frames():
+        with f:
+            while True:
+                data = f.read(REPLAY_FRAME.size)
+                if len(data) < REPLAY_FRAME.size:
+                    return
+                ticks, steps, t, level, w, h, crc, n_cursors, n_rects, n_events = REPLAY_FRAME.unpack(data)
+                cursors = [REPLAY_POINT.unpack(f.read(REPLAY_POINT.size)) for _ in range(n_cursors)]
+                rects = [REPLAY_RECT.unpack(f.read(REPLAY_RECT.size)) for _ in range(n_rects)]
+                events = []
+                for _ in range(n_events):
+                    kind, x, y, value = REPLAY_EVENT.unpack(f.read(REPLAY_EVENT.size))
+                    kind = REPLAY_EVENTS[kind]
+                    attrs = {"key": value} if kind == pygame.KEYDOWN else {"pos": (x, y), "button": value}
+                    events.append(pygame.event.Event(kind, attrs))
+                yield {"ticks": ticks, "steps": steps, "t": t, "level": level, "size": (w, h),
+                       "crc": crc, "cursors": cursors, "rects": rects, "events": events}
+    return header, frames()
+
+class WidgetLoop:
+    # One frame of the widget from its inputs - events, sim steps and the
+    # frame's time - shared by the live main loop and replays
+    def __init__(self, scene, window):
+        self.scene = scene
+        self.window = window
+        self.ticks = 0 # ms since the loop started, frozen for the whole frame
+        scene.clock = lambda: self.ticks
+        self.grip_cursor = None # whether the resize cursor is showing
+        self.loop_allocs = None # surface_allocs after the first frame
+        self.running = True
+
+    def frame_mode(self):
+        if self.window.active or self.scene.is_animating():
+            return "active"
+        if len(self.scene.fireflies) > 0:
+            return "ambient"
+        return "idle"
+
+    def frame(self, events, steps, t, ticks):
+        scene = self.scene
+        window = self.window
+        self.ticks = ticks
+        profiler = scene.profiler
+        profiler.begin_frame()
+        allocs_before = surface_allocs
+        rescales_before = scene.asset_cache.misses
+        events_start = time.perf_counter()
         for event in events:
-            if event.type == pygame.QUIT:
-                running = False
+            if event.type in (pygame.QUIT, pygame.WINDOWCLOSE):
+                self.running = False
+
+            # Window was uncovered / restored: contents may be gone
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+                scene.invalidate()
             
             # Key Handler
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
-                    running = False
+                    self.running = False
+                elif event.key == PROFILE_HOTKEY:
+                    scene.toggle_overlay()
             
             # Mouse Handler
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1: # Left Click
-                    mx, my = pygame.mouse.get_pos()
-                    
-                    # Check for Resize grip (bottom right 20x20)
-                    if mx > current_w - 20 and my > current_h - 20:
-                        resizing = True
-                        drag_start_pos = queryMousePosition() # Global
-                        # Store start size
-                        window_start_pos = (current_w, current_h)
-                    else:
-                        dragging = True
-                        pt = queryMousePosition() # Global screen pos
-                        drag_start_pos = (pt.x, pt.y)
-                        
-                        # Get current window pos
-                        windll.user32.GetWindowRect(hwnd, byref(rect))
-                        window_start_pos = (rect.left, rect.top)
+                    # Resize from the grip (bottom right 20x20), drag anywhere else
+                    window.press(resize=scene.in_grip(event.pos))
+
+            if event.type == pygame.MOUSEMOTION:
+                if window.active:
+                    window.motion()
+                else:
+                    self.hover(event)
 
             if event.type == pygame.MOUSEBUTTONUP:
-                if event.button == 1:
-                    dragging = False
-                    if resizing:
-                        resizing = False
-                        # Finalize size if needed, but we do it live
-                        pass
-
-        # Handle Dragging/Resizing logic outside event loop for smoothness
-        if dragging:
-            pt = queryMousePosition()
-            dx = pt.x - drag_start_pos[0]
-            dy = pt.y - drag_start_pos[1]
-            new_x = window_start_pos[0] + dx
-            new_y = window_start_pos[1] + dy
-            set_window_position(hwnd, new_x, new_y, current_w, current_h)
-            
-        if resizing:
-            pt = queryMousePosition() 
-            # This is tricky because dx/dy is global.
-            dx = pt.x - drag_start_pos.x
-            dy = pt.y - drag_start_pos.y
-            
-            new_w = max(100, window_start_pos[0] + dx)
-            new_h = max(100, window_start_pos[1] + dy)
-            
-            if new_w != current_w or new_h != current_h:
-                current_w = new_w
-                current_h = new_h
-                # Re-init screen
-                screen = pygame.display.set_mode((current_w, current_h), pygame.NOFRAME)
-                # Rescale assets
-                bg_img, cat_images = scale_assets(current_w, current_h)
-                cat.update_images(cat_images)
-                cat.update_pos(current_w, current_h)
-                
-                # Update global for Firefly class
-                WINDOW_WIDTH = current_w
-                WINDOW_HEIGHT = current_h
-                
-                # Update fireflies bounds (they might go out of bounds, let's pull them in)
-                for f in fireflies:
-                    f.x = min(f.x, current_w)
-                    f.y = min(f.y, current_h)
+                if event.button == 1 and window.active:
+                    # Apply the last motion before letting go
+                    screen = window.flush()
+                    if screen is not None:
+                        scene.resize(screen)
+                    if window.release() == "resize":
+                        scene.finish_resize()
+
+        # At most one window move or resize per frame
+        screen = window.flush()
+        if screen is not None:
+            scene.resize(screen)
+
+        profiler.add("events", time.perf_counter() - events_start)
 
         # Update
-        cat.update()
-        
-        # Change cursor near corner
-        mx, my = pygame.mouse.get_pos()
-        if not resizing and not dragging:
-            if mx > current_w - 20 and my > current_h - 20:
-                pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_SIZENWSE)
+        scene.update(steps, t)
+
+        scene.render()
+        if self.loop_allocs is None:
+            self.loop_allocs = surface_allocs
+        profiler.end_frame(surface_allocs - allocs_before, scene.asset_cache.misses - rescales_before)
+
+    def hover(self, event):
+        # Change cursor near corner. Also called while the scheduler waits,
+        # so hovering needs no frame of its own
+        if not self.window.active and self.scene.in_grip(event.pos) != self.grip_cursor:
+            self.grip_cursor = self.scene.in_grip(event.pos)
+            self.window.backend.set_cursor(self.grip_cursor)
+
+    def print_stats(self):
+        print(f"Surfaces allocated after the first frame: {surface_allocs - (self.loop_allocs or 0)}")
+        stats = self.scene.asset_cache.stats()
+        print(f"Asset cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, "
+              f"{stats['entries']} entries, {stats['bytes'] / 1024:.0f} KB")
+
+def events_for(events, screen):
+    # One window's share of the events: its own, and those tied to no window
+    own = getattr(screen, "window", None)
+    return [e for e in events if getattr(e, "window", None) in (None, own)]
+
+def print_resident(asset_cache):
+    for name, usage in sorted(asset_cache.resident().items()):
+        print(f"  {name}: {usage['bytes'] / 1024:.0f} KB, {usage['copies']} "
+              f"cop{'ies' if usage['copies'] != 1 else 'y'}, held by {usage['holders']}")
+
+def replay(path, realtime=False):
+    # Feeds a recorded session back through the widget headless, as fast as
+    # possible or at the recorded pace, and checks every frame against the recording
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    header, frames = read_session(path)
+    pygame.display.init()
+    w, h = header["size"]
+    screen = pygame.display.set_mode((w, h), pygame.NOFRAME)
+    backend = ReplayBackend((0, 0, w, h))
+    window = WindowInteraction(backend, (w, h))
+    scene = CozyScene(screen, firefly_count=header["fireflies"], seed=header["seed"],
+                      companions=header["companions"], hour=header["hour"], present_mode=None)
+    loop = WidgetLoop(scene, window)
+
+    level = 0
+    count = 0
+    ticks = 0
+    mismatches = []
+    start = time.perf_counter()
+    for frame in frames:
+        if realtime:
+            delay = frame["ticks"] / 1000 - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        if frame["level"] != level:
+            level = frame["level"]
+            scene.set_quality(QUALITY_LEVELS[level])
+        backend.feed(frame["cursors"], frame["rects"])
+        loop.frame(frame["events"], frame["steps"], frame["t"], frame["ticks"])
+        if frame_crc(scene.screen) != frame["crc"]:
+            mismatches.append(count)
+        count += 1
+        ticks = frame["ticks"]
+    elapsed = time.perf_counter() - start
+
+    print(f"Replayed {count} frames ({ticks / 1000:.1f} s recorded) in {elapsed:.2f} s")
+    if mismatches:
+        print(f"{len(mismatches)} frames differ from the recording, first at frame {mismatches[0]}")
+    else:
+        print("Every frame matches the recording")
+    loop.print_stats()
+    scene.profiler.close()
+    pygame.quit()
+    return not mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Cozy desktop widget")
+    parser.add_argument("--record", default=RECORD_LOG, metavar="LOG", help="record the session to LOG")
+    parser.add_argument("--replay", metavar="LOG", help="replay a recorded session headless and exit")
+    parser.add_argument("--realtime", action="store_true", help="replay at the recorded pace")
+    parser.add_argument("--renderer", choices=("surface", "texture"), default=RENDER_BACKEND,
+                        help="render backend (recordings always use surface, so replays can check frames)")
+    parser.add_argument("--widgets", type=int, default=WIDGETS,
+                        help="widgets in this process, each in its own window (more than one uses textures)")
+    parser.add_argument("--present", choices=("none",) + PRESENT_MODES, default=PRESENT_MODE or "none",
+                        help="draw at the default size and scale each frame to the window this way "
+                             "(recordings always use none)")
+    args = parser.parse_args()
+    if args.replay:
+        sys.exit(0 if replay(args.replay, args.realtime) else 1)
+    if args.record and args.widgets > 1:
+        parser.error("--record records a single widget")
+
+    startup = StartupTimer()
+    # Decoding starts before anything else, on worker threads
+    loader = AssetLoader(default_asset_dir())
+    startup.mark("decode queued")
+
+    # Only video (and its events) - no audio, joystick or font until needed
+    pygame.display.init()
+    startup.mark("display init")
+    
+    # Initial dimensions
+    current_w = WINDOW_WIDTH
+    current_h = WINDOW_HEIGHT
+    
+    # Setup windows - No frame for widget look
+    titles = [WINDOW_TITLE] if args.widgets <= 1 else [f"{WINDOW_TITLE} {i + 1}" for i in range(args.widgets)]
+    screens = []
+    if (args.renderer == "texture" or len(titles) > 1) and not args.record:
+        for i, title in enumerate(titles):
+            screen = open_texture_screen(title, (current_w, current_h))
+            if screen is None:
+                break
+            if i:
+                x, y = screens[0].window.position
+                screen.window.position = (x + i * WIDGET_CASCADE, y + i * WIDGET_CASCADE)
+            screens.append(screen)
+        if len(screens) < len(titles):
+            print(f"Opened {len(screens)} of {len(titles)} widget windows")
+    textured = bool(screens)
+    if not textured:
+        screens = [pygame.display.set_mode((current_w, current_h), pygame.NOFRAME)]
+        pygame.display.set_caption(WINDOW_TITLE)
+    startup.mark("window")
+    
+    # Window-system calls go through a backend (Win32 here, RecordingBackend headless)
+    windows = []
+    for screen, title in zip(screens, titles):
+        if sys.platform == "win32":
+            hwnd = pygame.display.get_wm_info()['window']
+            if textured:
+                hwnd = windll.user32.FindWindowW(None, title)
+            backend = Win32Backend(hwnd)
+        else:
+            backend = RecordingBackend(display=True)
+        if textured:
+            backend.texture_screen = screen
+        windows.append(WindowInteraction(backend, (current_w, current_h)))
+
+    try:
+        # First frame: just the background, while the rest finishes decoding
+        asset_cache = AssetCache() # shared by every widget
+        background = asset_cache.original('background', lambda: loader.get('background').convert())
+        for screen in screens:
+            if textured:
+                screen.draw(background, (0, 0, current_w, current_h))
+                screen.present()
             else:
-                pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
+                screen.blit(asset_cache.scaled("background", background, (current_w, current_h), SCALE_FILTER), (0, 0))
+                pygame.display.flip()
+        startup.mark("first frame")
+        first_frame_ms = startup.since_start_ms()
 
-        # Draw
-        screen.blit(bg_img, (0, 0))
-        cat.draw(screen)
-        
-        for f in fireflies:
-            f.draw(screen)
+        hour = lighting_start_hour()
+        present_mode = None if args.present == "none" or args.record else args.present
+        scenes = [CozyScene(screen, loader=loader, asset_cache=asset_cache, hour=hour, present_mode=present_mode,
+                            profile_log=widget_log_path(PROFILE_LOG, i, len(screens)))
+                  for i, screen in enumerate(screens)]
+        startup.mark("scene" if len(scenes) == 1 else f"{len(scenes)} scenes")
+    except FileNotFoundError as e:
+        print(f"Error loading assets: {e}")
+        return
+    print(startup.report(first_frame_ms))
+    print("Resident assets:")
+    print_resident(asset_cache)
 
-        # Draw subtle resize handle
-        pygame.draw.line(screen, (200, 200, 200), (current_w-10, current_h-2), (current_w-2, current_h-10), 1)
-        pygame.draw.line(screen, (200, 200, 200), (current_w-6, current_h-2), (current_w-2, current_h-6), 1)
+    # One scheduler, clock and governor for every widget
+    scheduler = FrameScheduler()
+    governor = QualityGovernor()
+    sim = FixedTimestep()
 
-        pygame.display.flip()
-        clock.tick(FPS)
+    loops = [WidgetLoop(scene, window) for scene, window in zip(scenes, windows)]
+    recorder = None
+    if args.record:
+        recorder = SessionRecorder(args.record, scenes[0], (current_w, current_h))
+        windows[0].backend.observer = recorder.observe
+
+    live = list(loops)
+    loop_start = ticks_ms()
+
+    def hover(event):
+        # Cursor changes between frames, in the widget the mouse is over
+        for loop in live:
+            if events_for([event], loop.scene.screen):
+                loop.hover(event)
+
+    while live:
+        # Event Handling (sleeps until the next frame is due or input arrives)
+        # While dragging, motion is coalesced into one window update per frame
+        # The busiest widget sets the pace
+        modes = {loop.frame_mode() for loop in live}
+        mode = next(m for m in FrameScheduler.RATES if m in modes)
+        changes = [c for c in (loop.scene.next_change_ms() for loop in live) if c is not None]
+        dragging = any(loop.window.active for loop in live)
+        events = scheduler.wait(mode, min(changes, default=None), wake_on_input=not dragging, hover=hover)
+        frame_start = time.perf_counter()
+        steps, t = sim.advance()
+        ticks = ticks_ms() - loop_start
+        level = governor.level
+        for loop in live:
+            loop.frame(events_for(events, loop.scene.screen), steps, t, ticks)
+        if recorder:
+            recorder.frame(ticks, steps, t, level, windows[0].size, events, scenes[0].screen)
+
+        # Closed widgets let go of their assets and windows
+        for loop in [loop for loop in live if not loop.running]:
+            live.remove(loop)
+            loop.scene.close()
+            if live:
+                loop.scene.screen.close()
+                print("Widget closed, resident assets:")
+                print_resident(asset_cache)
+
+        # Step quality down when over budget, back up when there is headroom
+        quality = governor.end_frame(time.perf_counter() - frame_start)
+        if quality is not None:
+            for loop in live:
+                loop.scene.set_quality(quality)
+            scheduler.set_max_fps(quality["fps"])
+            print(f"Governor: {governor.describe()}")
 
+    stats = scheduler.stats()
+    print(f"Effective FPS: {stats['fps']:.1f}, "
+          f"work {stats['work_ms']} ms, sleep {stats['sleep_ms']} ms ({stats['sleep_pct']:.0f}% asleep)")
+    calls = sum((window.backend.calls for window in windows), Counter())
+    print("Window calls: " + ", ".join(f"{n} {name}" for name, n in sorted(calls.items())))
+    print(f"Governor: {governor.changes} changes, {governor.describe()}")
+    loops[0].print_stats() # the counters and the cache are shared
+    if recorder:
+        recorder.close()
+        print(f"Recorded {recorder.frames} frames to {args.record}")
+    for scene in scenes:
+        scene.profiler.close()
     pygame.quit()
 
 if __name__ == "__main__":
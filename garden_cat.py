@@ -1,15 +1,18 @@
 import pygame
+import os
 import sys
 import random
 import math
-
-# Initialize pygame
-pygame.init()
+import numpy as np
 
 # Screen dimensions
 WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Peaceful Garden Cat")
+TREE_COUNT = 8
+CAT_COUNT = 1
+GRID_CELL = 64 # spatial index cell size, in pixels
+# "surface" blits into the display surface; "texture" draws through a
+# pygame._sdl2.video Renderer, falling back to "surface" if there is none
+RENDER_BACKEND = os.environ.get("GARDEN_RENDERER", "surface")
 
 # Colors
 SKY_BLUE = (135, 206, 235)
@@ -21,74 +24,203 @@ BLACK = (0, 0, 0)
 PINK = (255, 182, 193)
 YELLOW = (255, 255, 0)
 
-# Cat class
-class Cat:
-    def __init__(self):
-        self.x = WIDTH // 2
-        self.y = HEIGHT // 2
+# Spatial index
+class SpatialGrid:
+    # Uniform grid over axis-aligned boxes. Every box is filed under each cell
+    # it overlaps, stored CSR-style (box ids sorted by cell plus the offset
+    # where each cell starts), so building is a few NumPy calls and a rect
+    # query is one slice per grid row followed by an exact overlap test.
+    def __init__(self, width, height, cell_size=GRID_CELL):
+        self.cell = cell_size
+        self.cols = max(1, -(-width // cell_size))
+        self.rows = max(1, -(-height // cell_size))
+        empty = np.empty(0)
+        self.build(empty, empty, empty, empty)
+
+    def build(self, left, top, right, bottom):
+        self.boxes = np.array([left, top, right, bottom], dtype=float).reshape(4, -1)
+        c0 = np.clip(self.boxes[0] // self.cell, 0, self.cols - 1).astype(np.intp)
+        c1 = np.clip(self.boxes[2] // self.cell, 0, self.cols - 1).astype(np.intp)
+        r0 = np.clip(self.boxes[1] // self.cell, 0, self.rows - 1).astype(np.intp)
+        r1 = np.clip(self.boxes[3] // self.cell, 0, self.rows - 1).astype(np.intp)
+
+        # One (box, cell) pair per covered cell
+        nx = c1 - c0 + 1
+        counts = nx * (r1 - r0 + 1)
+        ids = np.repeat(np.arange(len(counts)), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        keys = (r0[ids] + k // nx[ids]) * self.cols + c0[ids] + k % nx[ids]
+
+        order = np.argsort(keys, kind="stable")
+        self.items = ids[order]
+        self.starts = np.searchsorted(keys[order], np.arange(self.rows * self.cols + 1))
+
+    def _span(self, lo, hi, count):
+        return (min(max(int(lo // self.cell), 0), count - 1),
+                min(max(int(hi // self.cell), 0), count - 1))
+
+    def query(self, rect):
+        # Ids of the boxes overlapping rect (x, y, w, h)
+        x, y, w, h = rect
+        c0, c1 = self._span(x, x + w, self.cols)
+        r0, r1 = self._span(y, y + h, self.rows)
+        parts = [self.items[self.starts[r * self.cols + c0]:self.starts[r * self.cols + c1 + 1]]
+                 for r in range(r0, r1 + 1)]
+        found = np.unique(np.concatenate(parts))
+        left, top, right, bottom = self.boxes[:, found]
+        return found[(left < x + w) & (right > x) & (top < y + h) & (bottom > y)]
+
+    def near(self, x, y, radius):
+        # Ids of the boxes centred within radius of (x, y), nearest first
+        found = self.query((x - radius, y - radius, 2 * radius, 2 * radius))
+        left, top, right, bottom = self.boxes[:, found]
+        dist = np.hypot((left + right) / 2 - x, (top + bottom) / 2 - y)
+        inside = dist <= radius
+        return found[inside][np.argsort(dist[inside], kind="stable")]
+
+# Cats
+class CatHerd:
+    # Struct-of-arrays cats: each cat is a slot in the NumPy arrays below and
+    # one vectorized step moves every cat towards its own target. Positions
+    # are indexed in a SpatialGrid for clicks, culling and neighbour lookups.
+    def __init__(self, count=1, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.size = 40
         self.speed = 2
-        self.target_x = self.x
-        self.target_y = self.y
-        self.moving = False
-        self.direction = 1  # 1 for right, -1 for left
-        
+        self.x = self.rng.uniform(self.size, WIDTH - self.size, count)
+        self.y = self.rng.uniform(HEIGHT // 2, HEIGHT - self.size, count)
+        if count:
+            # The first cat starts in the middle, like the single cat always did
+            self.x[0] = WIDTH // 2
+            self.y[0] = HEIGHT // 2
+        self.target_x = self.x.copy()
+        self.target_y = self.y.copy()
+        self.moving = np.zeros(count, dtype=bool)
+        self.direction = np.ones(count, dtype=np.int8)  # 1 for right, -1 for left
+        self.grid = SpatialGrid(WIDTH, HEIGHT)
+        self.reindex()
+
+    def __len__(self):
+        return len(self.x)
+
+    def reindex(self):
+        s = self.size
+        self.grid.build(self.x - s, self.y - s, self.x + s, self.y + s)
+        self.indexed = True
+
     def update(self):
         # Move towards target if not at target
-        if self.moving:
-            dx = self.target_x - self.x
-            dy = self.target_y - self.y
-            distance = math.sqrt(dx*dx + dy*dy)
-            
-            if distance > 5:
-                self.x += (dx / distance) * self.speed
-                self.y += (dy / distance) * self.speed
-            else:
-                self.moving = False
-                
+        walking = np.flatnonzero(self.moving)
+        if len(walking):
+            dx = self.target_x[walking] - self.x[walking]
+            dy = self.target_y[walking] - self.y[walking]
+            distance = np.hypot(dx, dy)
+            far = distance > 5
+            step = walking[far]
+            self.x[step] += dx[far] / distance[far] * self.speed
+            self.y[step] += dy[far] / distance[far] * self.speed
+            self.moving[walking[~far]] = False
+            self.indexed = False
+
         # Change direction occasionally
-        if random.random() < 0.01:
-            self.direction *= -1
+        flip = self.rng.random(len(self.x)) < 0.01
+        self.direction[flip] *= -1
+
+    def set_target(self, i, x, y):
+        # i may be one index or an array of them
+        self.target_x[i] = x
+        self.target_y[i] = y
+        self.moving[i] = True
+
+    def _grid(self):
+        if not self.indexed:
+            self.reindex()
+        return self.grid
+
+    def cat_at(self, pos):
+        # Index of the cat under pos, or None
+        hits = self._grid().near(pos[0], pos[1], self.size)
+        return int(hits[0]) if len(hits) else None
+
+    def nearest(self, pos):
+        # Index of the cat closest to pos, widening the search until one turns up
+        radius = self.size
+        while len(self.x):
+            hits = self._grid().near(pos[0], pos[1], radius)
+            if len(hits):
+                return int(hits[0])
+            radius *= 2
+        return None
+
+    def in_view(self, view):
+        if pygame.Rect(view).contains((0, 0, WIDTH, HEIGHT)):
+            # The whole garden is on screen, nothing to cull
+            return np.arange(len(self.x))
+        return self._grid().query(view)
+
+    def sprites(self, view):
+        # (direction, top-left on screen) of each cat overlapping the view
+        shown = self.in_view(view)
+        ox = view[0] + self.size
+        oy = view[1] + self.size
+        return [(d, (int(x) - ox, int(y) - oy)) for x, y, d in
+                zip(self.x[shown].tolist(), self.y[shown].tolist(), self.direction[shown].tolist())]
+
+    def draw(self, surface, view):
+        # Only the cats overlapping the view, at their cached sprites
+        sprites = {d: cat_sprite(d, self.size) for d in (1, -1)}
+        surface.blits([(sprites[d], pos) for d, pos in self.sprites(view)], doreturn=False)
+
+def draw_cat(surface, x, y, size, direction):
+    # The procedural cat, centred on (x, y)
+    # Draw cat body
+    pygame.draw.circle(surface, LIGHT_BROWN, (x, y), size//2)
     
-    def draw(self, surface):
-        # Draw cat body
-        pygame.draw.circle(surface, LIGHT_BROWN, (self.x, self.y), self.size//2)
-        
-        # Draw cat ears
-        ear_offset = self.size // 3
-        pygame.draw.polygon(surface, LIGHT_BROWN, [
-            (self.x - ear_offset, self.y - self.size//2),
-            (self.x - ear_offset//2, self.y - self.size),
-            (self.x, self.y - self.size//2)
-        ])
-        pygame.draw.polygon(surface, LIGHT_BROWN, [
-            (self.x + ear_offset, self.y - self.size//2),
-            (self.x + ear_offset//2, self.y - self.size),
-            (self.x, self.y - self.size//2)
-        ])
-        
-        # Draw cat eyes
-        eye_size = self.size // 6
-        pygame.draw.circle(surface, BLACK, (self.x - eye_size, self.y), eye_size)
-        pygame.draw.circle(surface, BLACK, (self.x + eye_size, self.y), eye_size)
-        
-        # Draw cat nose
-        pygame.draw.circle(surface, PINK, (self.x, self.y + eye_size//2), eye_size//2)
-        
-        # Draw cat mouth
-        pygame.draw.arc(surface, BLACK, 
-                       (self.x - eye_size, self.y, eye_size*2, eye_size*2),
-                       0, math.pi, 2)
-        
-        # Draw tail
-        tail_length = self.size // 2
-        tail_x = self.x - self.direction * tail_length if self.direction == -1 else self.x + self.direction * tail_length
-        pygame.draw.line(surface, LIGHT_BROWN, (self.x, self.y), (tail_x, self.y + tail_length//2), 5)
+    # Draw cat ears
+    ear_offset = size // 3
+    pygame.draw.polygon(surface, LIGHT_BROWN, [
+        (x - ear_offset, y - size//2),
+        (x - ear_offset//2, y - size),
+        (x, y - size//2)
+    ])
+    pygame.draw.polygon(surface, LIGHT_BROWN, [
+        (x + ear_offset, y - size//2),
+        (x + ear_offset//2, y - size),
+        (x, y - size//2)
+    ])
+    
+    # Draw cat eyes
+    eye_size = size // 6
+    pygame.draw.circle(surface, BLACK, (x - eye_size, y), eye_size)
+    pygame.draw.circle(surface, BLACK, (x + eye_size, y), eye_size)
+    
+    # Draw cat nose
+    pygame.draw.circle(surface, PINK, (x, y + eye_size//2), eye_size//2)
     
-    def set_target(self, x, y):
-        self.target_x = x
-        self.target_y = y
-        self.moving = True
+    # Draw cat mouth
+    pygame.draw.arc(surface, BLACK, 
+                   (x - eye_size, y, eye_size*2, eye_size*2),
+                   0, math.pi, 2)
+    
+    # Draw tail
+    tail_length = size // 2
+    tail_x = x - direction * tail_length if direction == -1 else x + direction * tail_length
+    pygame.draw.line(surface, LIGHT_BROWN, (x, y), (tail_x, y + tail_length//2), 5)
+
+# The cat only changes with direction and size, so each combination is drawn
+# once into a transparent sprite (2*size square, cat centred) and blitted after
+_cat_sprites = {}
+
+def cat_sprite(direction, size):
+    key = (direction, size)
+    sprite = _cat_sprites.get(key)
+    if sprite is None:
+        sprite = pygame.Surface((size * 2, size * 2), pygame.SRCALPHA)
+        draw_cat(sprite, size, size, size, direction)
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert_alpha()
+        _cat_sprites[key] = sprite
+    return sprite
 
 # Tree class
 class Tree:
@@ -99,61 +231,180 @@ class Tree:
         self.trunk_height = 60
         self.crown_radius = 40
         
-    def draw(self, surface):
+    def bounds(self):
+        # (left, top, right, bottom) of trunk and crown together
+        return (self.x - self.crown_radius, self.y - self.crown_radius//2 - self.crown_radius,
+                self.x + self.crown_radius, self.y + self.trunk_height)
+
+    def draw(self, surface, offset=(0, 0)):
+        x = self.x - offset[0]
+        y = self.y - offset[1]
         # Draw trunk
-        pygame.draw.rect(surface, BROWN, (self.x - self.trunk_width//2, self.y, self.trunk_width, self.trunk_height))
+        pygame.draw.rect(surface, BROWN, (x - self.trunk_width//2, y, self.trunk_width, self.trunk_height))
         
         # Draw crown
-        pygame.draw.circle(surface, GRASS_GREEN, (self.x, self.y - self.crown_radius//2), self.crown_radius)
-
-# Create game objects
-cat = Cat()
-trees = []
-for i in range(8):
-    trees.append(Tree(
-        random.randint(50, WIDTH-50),
-        random.randint(100, HEIGHT-100)
-    ))
-
-# Main game loop
-clock = pygame.time.Clock()
-running = True
-
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            # Only move cat when clicking on the window (not on the cat itself)
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-            # Check if click is not on the cat
-            distance_to_cat = math.sqrt((mouse_x - cat.x)**2 + (mouse_y - cat.y)**2)
-            if distance_to_cat > cat.size:
-                cat.set_target(mouse_x, mouse_y)
-    
-    # Update game objects
-    cat.update()
-    
-    # Draw everything
-    screen.fill(SKY_BLUE)
-    
-    # Draw grass
-    pygame.draw.rect(screen, GRASS_GREEN, (0, HEIGHT//2, WIDTH, HEIGHT//2))
-    
-    # Draw trees
-    for tree in trees:
-        tree.draw(screen)
-    
-    # Draw cat
-    cat.draw(screen)
-    
-    # Draw title
-    font = pygame.font.SysFont(None, 36)
-    text = font.render("Peaceful Garden", True, BLACK)
-    screen.blit(text, (WIDTH//2 - text.get_width()//2, 20))
-    
-    pygame.display.flip()
-    clock.tick(60)
+        pygame.draw.circle(surface, GRASS_GREEN, (x, y - self.crown_radius//2), self.crown_radius)
+
+def create_trees(count=TREE_COUNT):
+    trees = []
+    for i in range(count):
+        trees.append(Tree(
+            random.randint(50, WIDTH-50),
+            random.randint(100, HEIGHT-100)
+        ))
+    return trees
+
+def handle_click(cats, pos):
+    # Only move a cat when clicking on the window (not on a cat itself);
+    # the nearest one comes over
+    if cats.cat_at(pos) is None:
+        i = cats.nearest(pos)
+        if i is not None:
+            cats.set_target(i, pos[0], pos[1])
+
+class GardenRenderer:
+    # Layers, back to front: the static background (sky, grass, trees, title),
+    # drawn once into a cached surface, then the cats on top every frame.
+    # view is the part of the garden on screen; only trees and cats that
+    # overlap it are drawn. Call invalidate() when the trees change.
+    def __init__(self, trees, view=None):
+        self.trees = trees
+        self.view = pygame.Rect(view or (0, 0, WIDTH, HEIGHT))
+        self.tree_grid = SpatialGrid(WIDTH, HEIGHT)
+        self.background = None
+        self.font = None
+        self.invalidate()
+
+    def invalidate(self):
+        self.tree_grid.build(*np.array([t.bounds() for t in self.trees], dtype=float).reshape(-1, 4).T)
+        self.background = None
+
+    def set_view(self, view):
+        view = pygame.Rect(view)
+        if view != self.view:
+            self.view = view
+            self.background = None
+
+    def _build_background(self, size):
+        bg = pygame.Surface(size).convert()
+        bg.fill(SKY_BLUE)
+        
+        # Draw grass
+        pygame.draw.rect(bg, GRASS_GREEN, (0, HEIGHT//2 - self.view.y, size[0], HEIGHT - HEIGHT//2))
+        
+        # Draw trees
+        for i in self.tree_grid.query(self.view).tolist():
+            self.trees[i].draw(bg, self.view.topleft)
+        
+        # Draw title (looking the font up is slow, so only once)
+        if self.font is None:
+            self.font = pygame.font.SysFont(None, 36)
+        text = self.font.render("Peaceful Garden", True, BLACK)
+        bg.blit(text, (WIDTH//2 - text.get_width()//2, 20))
+        return bg
+
+    def draw(self, screen, cats):
+        if self.background is None or self.background.get_size() != screen.get_size():
+            self.background = self._build_background(screen.get_size())
+        screen.blit(self.background, (0, 0))
+        
+        # Draw cats
+        cats.draw(screen, self.view)
+
+class GardenTextureRenderer(GardenRenderer):
+    # GardenRenderer drawing through a pygame._sdl2.video Renderer: the cached
+    # background and the two cat sprites become textures once, and each frame
+    # is just texture copies. The cat sprites aren't symmetric (the tail), so
+    # each direction keeps its own texture rather than flipping one.
+    def __init__(self, trees, renderer, view=None):
+        from pygame._sdl2 import video
+        self.video = video
+        self.renderer = renderer
+        self.textures = {}
+        super().__init__(trees, view)
+
+    def invalidate(self):
+        super().invalidate()
+        self.textures.pop("background", None)
+
+    def set_view(self, view):
+        super().set_view(view)
+        if self.background is None:
+            self.textures.pop("background", None)
+
+    def texture(self, key, surface):
+        tex = self.textures.get(key)
+        if tex is None:
+            tex = self.textures[key] = self.video.Texture.from_surface(self.renderer, surface)
+        return tex
+
+    def draw(self, screen, cats):
+        # screen is the Renderer's video.Window; only its size is used
+        size = tuple(screen.size)
+        if self.background is None or self.background.get_size() != size:
+            self.background = self._build_background(size)
+            self.textures.pop("background", None)
+        self.texture("background", self.background).draw()
+        sprites = {d: self.texture(d, cat_sprite(d, cats.size)) for d in (1, -1)}
+        w, h = cat_sprite(1, cats.size).get_size()
+        for d, (x, y) in cats.sprites(self.view):
+            sprites[d].draw(dstrect=(x, y, w, h))
+        self.renderer.present()
+
+def open_texture_window(title, size):
+    # (window, renderer), or None if pygame._sdl2 can't make a renderer here
+    try:
+        from pygame._sdl2 import video
+        from pygame._sdl2.sdl2 import error as sdl2_error # not a pygame.error
+    except ImportError as e:
+        print(f"Texture renderer unavailable ({e}), using the surface renderer")
+        return None
+    try:
+        # Surfaces still need a display format to convert() to
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
+        window = video.Window(title, size)
+        return window, video.Renderer(window)
+    except (pygame.error, sdl2_error) as e:
+        print(f"Texture renderer unavailable ({e}), using the surface renderer")
+        return None
+
+def main():
+    # Initialize pygame
+    pygame.init()
+    textured = open_texture_window("Peaceful Garden Cat", (WIDTH, HEIGHT)) if RENDER_BACKEND == "texture" else None
+    if textured:
+        screen, sdl_renderer = textured
+    else:
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("Peaceful Garden Cat")
+
+    # Create game objects
+    cats = CatHerd(CAT_COUNT)
+    trees = create_trees()
+    renderer = GardenTextureRenderer(trees, sdl_renderer) if textured else GardenRenderer(trees)
+
+    # Main game loop
+    clock = pygame.time.Clock()
+    running = True
+
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                handle_click(cats, pygame.mouse.get_pos())
+        
+        # Update game objects
+        cats.update()
+        
+        renderer.draw(screen, cats)
+        
+        if not textured:
+            pygame.display.flip()
+        clock.tick(60)
+
+    pygame.quit()
+    sys.exit()
 
-pygame.quit()
-sys.exit()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import os
+import sys
+import argparse
+import contextlib
+import queue
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Offline batch renderer: runs the cozy widget scene or the garden headless,
+# one fixed simulation step per frame and no frame cap, and streams the frames
+# to a PNG sequence or a raw RGBA pipe. Frames are encoded and written on a
+# background thread while the next ones render; --jobs splits the frame range
+# across processes (each fast-forwards the seeded simulation to its start, so
+# the output is the same for any job count). Logs go to stderr.
+#
+#   python render_frames.py cozy --frames 600 --out previews/cozy
+#   python render_frames.py garden --frames 3600 --size 800x600 --jobs 4 --out previews/garden
+#   python render_frames.py cozy --raw --out - | ffmpeg -f rawvideo -pix_fmt rgba -s 400x300 -r 60 -i - cozy.mp4
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import numpy as np
+import cozy_widget
+import garden_cat
+
+WRITE_QUEUE = 8 # frames rendered ahead of the writer before rendering waits
+WANDER_FRAMES = 60 # the garden crowd picks new targets this often
+COPY_CHUNK = 1 << 20
+
+class CozyJob:
+    # The widget scene, drawn at full size straight into the display surface
+    def __init__(self, size, seed, fireflies=cozy_widget.FIREFLY_COUNT, companions=cozy_widget.COMPANIONS,
+                 hour=None):
+        self.frame = 0
+        screen = pygame.display.set_mode(size, pygame.NOFRAME)
+        self.scene = cozy_widget.CozyScene(screen, firefly_count=fireflies, present_mode=None,
+                                           seed=seed, companions=companions, hour=hour)
+        # Simulated time, so nothing depends on how fast frames render
+        self.scene.clock = lambda: self.frame * 1000 // cozy_widget.SIM_HZ
+
+    def step(self):
+        self.scene.update(1, 0.0)
+        self.frame += 1
+
+    def draw(self):
+        self.scene.render()
+        return self.scene.screen
+
+class GardenJob:
+    # The garden, with the crowd wandering to new random targets now and then
+    def __init__(self, size, seed, trees=garden_cat.TREE_COUNT, cats=garden_cat.CAT_COUNT):
+        self.frame = 0
+        pygame.font.init() # for the title
+        random.seed(seed)
+        self.rng = np.random.default_rng(seed)
+        self.screen = pygame.display.set_mode(size)
+        self.herd = garden_cat.CatHerd(cats, self.rng)
+        self.renderer = garden_cat.GardenRenderer(garden_cat.create_trees(trees), (0, 0) + tuple(size))
+
+    def step(self):
+        if self.frame % WANDER_FRAMES == 0:
+            n = len(self.herd.x)
+            self.herd.set_target(np.arange(n), self.rng.uniform(0, garden_cat.WIDTH, n),
+                                 self.rng.uniform(0, garden_cat.HEIGHT, n))
+        self.herd.update()
+        self.frame += 1
+
+    def draw(self):
+        self.renderer.draw(self.screen, self.herd)
+        return self.screen
+
+JOBS = {"cozy": CozyJob, "garden": GardenJob}
+
+class PngSequence:
+    def __init__(self, out_dir, prefix):
+        os.makedirs(out_dir, exist_ok=True)
+        self.pattern = os.path.join(out_dir, prefix + "_{:05d}.png")
+
+    def write(self, index, surface):
+        pygame.image.save(surface, self.pattern.format(index))
+
+    def close(self):
+        pass
+
+class RawStream:
+    # Frames as bare RGBA bytes, back to back (what ffmpeg's rawvideo expects);
+    # path "-" is stdout
+    def __init__(self, path):
+        self.file = sys.__stdout__.buffer if path == "-" else open(path, "wb")
+
+    def write(self, index, surface):
+        self.file.write(pygame.image.tobytes(surface, "RGBA"))
+
+    def close(self):
+        if self.file is sys.__stdout__.buffer:
+            self.file.flush()
+        else:
+            self.file.close()
+
+class FrameWriter:
+    # Hands frames to sink.write on a background thread. Rendering only blocks
+    # when WRITE_QUEUE frames are waiting; a write error is raised on the next
+    # put() or on close().
+    def __init__(self, sink, depth=WRITE_QUEUE):
+        self.sink = sink
+        self.queue = queue.Queue(depth)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is None:
+                try:
+                    self.sink.write(*item)
+                except Exception as e:
+                    self.error = e
+
+    def put(self, index, surface):
+        if self.error:
+            raise self.error
+        self.queue.put((index, surface))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.sink.close()
+        if self.error:
+            raise self.error
+
+def render_range(scene, start, stop, size, seed, options, out, raw):
+    # Frames [start, stop) to out (a PNG directory or a raw file).
+    # Returns (frames written, seconds spent rendering and writing them).
+    with contextlib.redirect_stdout(sys.stderr):
+        pygame.display.init()
+        job = JOBS[scene](size, seed, **options)
+        for _ in range(start):
+            job.step()
+
+        writer = FrameWriter(RawStream(out) if raw else PngSequence(out, scene))
+        begin = time.perf_counter()
+        try:
+            for i in range(start, stop):
+                job.step()
+                # The screen is drawn over in place, so the writer gets a copy
+                writer.put(i, job.draw().copy())
+        finally:
+            writer.close()
+        elapsed = time.perf_counter() - begin
+        pygame.display.quit()
+    return stop - start, elapsed
+
+def split(frames, parts):
+    # parts contiguous (start, stop) ranges covering frames
+    edges = np.linspace(0, frames, parts + 1).astype(int).tolist()
+    return [(a, b) for a, b in zip(edges, edges[1:]) if b > a]
+
+def copy_into(dst, path):
+    with open(path, "rb") as src:
+        shutil.copyfileobj(src, dst, COPY_CHUNK)
+    os.remove(path)
+
+def parse_size(text):
+    try:
+        w, h = (int(p) for p in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected WIDTHxHEIGHT")
+    return w, h
+
+def main():
+    parser = argparse.ArgumentParser(description="Render scene frames headless, as fast as possible")
+    parser.add_argument("scene", choices=sorted(JOBS))
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--size", type=parse_size, help="WIDTHxHEIGHT (default: the scene's window size)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="frames", help="PNG directory, or with --raw a file or - for stdout")
+    parser.add_argument("--raw", action="store_true", help="write raw RGBA frames instead of PNGs")
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes, each rendering a frame range")
+    parser.add_argument("--fireflies", type=int, default=cozy_widget.FIREFLY_COUNT, help="cozy only")
+    parser.add_argument("--companions", type=int, default=cozy_widget.COMPANIONS, help="cozy only")
+    parser.add_argument("--hour", type=float, help="cozy only: light the scene from this hour of the day")
+    parser.add_argument("--trees", type=int, default=garden_cat.TREE_COUNT, help="garden only")
+    parser.add_argument("--cats", type=int, default=garden_cat.CAT_COUNT, help="garden only")
+    args = parser.parse_args()
+
+    if args.scene == "cozy":
+        size = args.size or (cozy_widget.WINDOW_WIDTH, cozy_widget.WINDOW_HEIGHT)
+        options = {"fireflies": args.fireflies, "companions": args.companions, "hour": args.hour}
+    else:
+        size = args.size or (garden_cat.WIDTH, garden_cat.HEIGHT)
+        options = {"trees": args.trees, "cats": args.cats}
+    ranges = split(args.frames, max(1, args.jobs))
+    if args.out == "-" and not args.raw:
+        parser.error("--out - needs --raw")
+
+    begin = time.perf_counter()
+    if len(ranges) == 1:
+        results = [render_range(args.scene, *ranges[0], size, args.seed, options, args.out, args.raw)]
+    elif not args.raw:
+        with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = [pool.submit(render_range, args.scene, a, b, size, args.seed, options, args.out, False)
+                       for a, b in ranges]
+            results = [f.result() for f in futures]
+    else:
+        # Each range goes to its own temporary file, appended in order as soon
+        # as it and every range before it are done
+        chunks = [tempfile.mkstemp(suffix=".rgba")[1] for _ in ranges]
+        dst = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+        try:
+            with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+                futures = [pool.submit(render_range, args.scene, a, b, size, args.seed, options, chunk, True)
+                           for (a, b), chunk in zip(ranges, chunks)]
+                results = []
+                for future, chunk in zip(futures, chunks):
+                    results.append(future.result())
+                    copy_into(dst, chunk)
+            dst.flush()
+        finally:
+            if dst is not sys.stdout.buffer:
+                dst.close()
+            for chunk in chunks:
+                if os.path.exists(chunk):
+                    os.remove(chunk)
+    wall = time.perf_counter() - begin
+
+    for (a, b), (frames, seconds) in zip(ranges, results):
+        print(f"frames {a}-{b - 1}: {frames / seconds:.1f} fps", file=sys.stderr)
+    total = sum(frames for frames, _ in results)
+    print(f"Rendered {total} {size[0]}x{size[1]} {args.scene} frames in {wall:.2f} s: "
+          f"{total / wall:.1f} fps overall ({len(ranges)} job{'s' if len(ranges) > 1 else ''}, "
+          f"plays at {cozy_widget.SIM_HZ} fps)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import pytest
+from cozy_widget import AMBIENT_FPS, FrameScheduler, ticks_ms
+
+# FrameScheduler.wait on the headless event queue: input that needs a frame
+# wakes it at once, hover motion waits for the frame the rate allows.
+
+@pytest.fixture
+def scheduler():
+    pygame.display.init()
+    pygame.display.set_mode((100, 100))
+    pygame.event.clear()
+    yield FrameScheduler()
+    pygame.display.quit()
+
+def motion(pos):
+    return pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(1, 0), buttons=(0, 0, 0))
+
+def test_hover_motion_waits_for_the_frame(scheduler):
+    hovered = []
+    scheduler.wait("active")
+    for x in range(3):
+        pygame.event.post(motion((x, 0)))
+    start = ticks_ms()
+    events = scheduler.wait("ambient", hover=hovered.append)
+    assert ticks_ms() - start >= 1000 // AMBIENT_FPS - 2
+    assert [e.pos for e in events] == [(0, 0), (1, 0), (2, 0)]
+    assert [e.pos for e in hovered] == [(0, 0), (1, 0), (2, 0)]
+
+def test_key_ends_the_wait(scheduler):
+    scheduler.wait("active")
+    pygame.event.post(motion((0, 0)))
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_a))
+    start = ticks_ms()
+    events = scheduler.wait("idle")
+    assert ticks_ms() - start < 100
+    assert [e.type for e in events] == [pygame.MOUSEMOTION, pygame.KEYDOWN]
@@ -0,0 +1,92 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import pytest
+import cozy_widget
+from cozy_widget import CozyScene, RecordingBackend, WidgetLoop, WindowInteraction
+
+# Window drag and resize on the headless backend: how many window-system calls
+# a gesture costs, with motion events coalesced into one update per frame.
+
+SIZE = (cozy_widget.WINDOW_WIDTH, cozy_widget.WINDOW_HEIGHT)
+
+@pytest.fixture
+def widget():
+    pygame.display.init()
+    screen = pygame.display.set_mode(SIZE, pygame.NOFRAME)
+    backend = RecordingBackend((100, 100) + SIZE)
+    window = WindowInteraction(backend, SIZE)
+    loop = WidgetLoop(CozyScene(screen, firefly_count=0, seed=1), window)
+    yield loop, backend
+    loop.scene.profiler.close()
+    pygame.display.quit()
+
+def press(pos):
+    return pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1)
+
+def release(pos):
+    return pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1)
+
+def motion(pos):
+    return pygame.event.Event(pygame.MOUSEMOTION, pos=pos)
+
+def run(loop, frames):
+    # frames: (cursor position during the frame, events)
+    for i, (cursor, events) in enumerate(frames):
+        loop.window.backend.cursor = cursor
+        loop.frame(events, 1, 0.0, i * 16)
+
+def test_drag_makes_one_move_per_frame(widget):
+    loop, backend = widget
+    frames = [((110, 110), [press((10, 10))])]
+    frames += [((110 + 5 * i, 110 + 3 * i), [motion((10, 10))] * 10) for i in range(1, 5)]
+    run(loop, frames)
+
+    assert backend.calls["move"] == 4
+    assert backend.calls["cursor_pos"] == 5 # the press, then one per frame with motion
+    assert backend.calls["window_rect"] == 1
+    assert backend.log == [("move", (100 + 5 * i, 100 + 3 * i) + SIZE) for i in range(1, 5)]
+
+def test_drag_without_cursor_change_makes_no_calls(widget):
+    loop, backend = widget
+    run(loop, [((110, 110), [press((10, 10))]), ((110, 110), [motion((10, 10))] * 10),
+               ((110, 110), [motion((10, 10))] * 10)])
+
+    assert backend.calls["move"] == 0
+    assert backend.log == []
+
+def test_release_applies_the_last_motion(widget):
+    loop, backend = widget
+    run(loop, [((110, 110), [press((10, 10))]), ((130, 120), [motion((10, 10)), release((10, 10))])])
+
+    assert backend.log == [("move", (120, 110) + SIZE)]
+    assert not loop.window.active
+    # Motion after letting go moves nothing
+    run(loop, [((200, 200), [motion((10, 10))])])
+    assert backend.calls["move"] == 1
+
+def test_resize_from_grip(widget):
+    loop, backend = widget
+    grip = (SIZE[0] - 5, SIZE[1] - 5)
+    frames = [((500, 500), [press(grip)])]
+    frames += [((500 + d, 500 + d), [motion(grip)] * 10) for d in (10, 20, 20, -1000)]
+    frames.append(((-500, -500), [release(grip)]))
+    run(loop, frames)
+
+    w, h = SIZE
+    min_size = WindowInteraction.MIN_SIZE
+    # The repeated 20 px frame and the release add nothing
+    assert backend.log == [("resize", (w + 10, h + 10)), ("resize", (w + 20, h + 20)),
+                           ("resize", (min_size, min_size))]
+    assert backend.calls["resize"] == 3
+    assert loop.scene.w == min_size
+
+def test_grip_cursor_changes_once_per_crossing(widget):
+    loop, backend = widget
+    grip = (SIZE[0] - 5, SIZE[1] - 5)
+    run(loop, [((0, 0), [motion((50, 50))] * 3), ((0, 0), [motion(grip)] * 3),
+               ((0, 0), [motion((50, 50))] * 3)])
+
+    assert backend.log == [("set_cursor", False), ("set_cursor", True), ("set_cursor", False)]